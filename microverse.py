@@ -1,15 +1,33 @@
 #!/usr/bin/env python3
 import argparse
 import base64
+import bisect
+import contextlib
 import hashlib
+import heapq
+import csv
 import html
 import io
+import json
 import math
+import os
 import struct
-from typing import Dict, List, Optional, Tuple
+import sys
+import time
+from array import array
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ModuleNotFoundError:
+    np = None
 
 
 MASK32 = 0xFFFFFFFF
+MASK64 = 0xFFFFFFFFFFFFFFFF
+LCG_MULTIPLIER = 1664525
+LCG_INCREMENT = 1013904223
 DEFAULT_SCALE = 8
 EXPORT_SCALE = 2
 VIDEO_FPS = 30
@@ -42,13 +60,99 @@ REGIME_WINDOW = 80
 REGIME_SHIFT_DELTA = 0.12
 EVENT_HOLD_STEPS = 180
 COUNTERFACTUAL_RAINFALL_SCALE = 0.85
+COUNTERFACTUAL_WORKERS = 2
+COUNTERFACTUAL_QUEUE = 4
+SWEEP_PARAMETERS = ("rainfall_scale", "temp_offset", "rain_multiplier", "gravity")
+SWEEP_BASE = {"rainfall_scale": 1.0, "temp_offset": 0.0, "rain_multiplier": 1.0, "gravity": 1.0}
+SWEEP_GRID = {
+    "rainfall_scale": (0.95, 0.9, 0.85, 0.8, 0.75, 0.7, 0.6, 0.5, 1.1, 1.25),
+    "temp_offset": (-0.05, -0.1, -0.2, 0.05, 0.1, 0.2),
+    "rain_multiplier": (0.9, 0.8, 0.6, 1.1, 1.25, 1.5),
+    "gravity": (0.8, 0.6, 1.2, 1.5),
+}
+SWEEP_DT = 1.0 / 60.0
+BATCH_DT = 1.0
+BATCH_TASKS_PER_CHILD = 64
+BENCH_SIZES = (32, 64, 128)
+BENCH_AGENTS = (0, 256, 1024)
+BENCH_REPEATS = 5
+BENCH_STEPS = 30
+BENCH_THRESHOLD = 0.25
+BENCH_MIN_BATCH = 0.02
+BENCH_MIN_SECONDS = 1e-3
+SELFTEST_SIZE = 32
+SELFTEST_STEPS = 20
+BATCH_CSV_FIELDS = (
+    "seed",
+    "width",
+    "height",
+    "steps",
+    "backend",
+    "agent_mode",
+    "rng_mode",
+    "digest",
+    "herbivores",
+    "predators",
+    "herbivores_min",
+    "herbivores_max",
+    "herbivores_mean",
+    "predators_min",
+    "predators_max",
+    "predators_mean",
+    "plant_mean",
+    "events",
+)
+CHECKPOINT_INTERVAL = 120
+CHECKPOINT_RING = 8
+SNAPSHOT_MAGIC = b"MVS2"
+SNAPSHOT_HEADER = "<QIIIQQIIIIddBB"
+WORLD_CACHE_ENTRIES = 4
+WORLD_CACHE_MAGIC = b"MVW1"
+# Bump whenever build_fields, build_flow_fields or the file layout changes, so
+# stale disk entries are ignored instead of loaded.
+WORLD_CACHE_VERSION = 2
 VIEW3D_FOV_DEG = 70.0
 VIEW3D_QUALITY_PRESETS = [
     {"name": "Low", "step": 1.2, "max_dist_scale": 0.75, "vertical_scale": 0.6},
     {"name": "Med", "step": 0.8, "max_dist_scale": 1.0, "vertical_scale": 0.85},
     {"name": "High", "step": 0.5, "max_dist_scale": 1.2, "vertical_scale": 1.0},
 ]
+HEATMAP_LAYERS = ("plants", "moisture")
+HEATMAP_RAMPS = {
+    "plants": ((16, 24, 16), (40, 110, 60), (170, 220, 120)),
+    "moisture": ((26, 22, 18), (46, 92, 132), (150, 200, 240)),
+}
+DASHBOARD_BG = (18, 18, 22)
+DASHBOARD_BORDER = (60, 60, 70)
+DASHBOARD_TEXT = (220, 220, 230)
+DASHBOARD_PLANT = (80, 200, 120)
+DASHBOARD_HERB = (220, 200, 80)
+DASHBOARD_PRED = (220, 80, 80)
 VIEW3D_TARGET_FPS = 30.0
+VIEW3D_LOD_LEVELS = 4
+VIEW3D_LOD_DISTANCE = 32.0
+VIEW3D_LOD_REACH = 1.5
+VIEW3D_FOG_STEPS = 64
+LIGHTING_QUANT_STEPS = 24
+LIGHT_NORMAL_BITS = 14
+LIGHT_DOT_BITS = 12
+LIGHT_FRAC_BITS = 16
+LIGHT_AMBIENT = 0.22
+LIGHT_AMBIENT_SUN = 0.35
+LIGHT_DIFFUSE = 0.6
+LIGHT_DIFFUSE_FLOOR = 0.25
+LIGHT_DIFFUSE_SUN = 0.75
+LIGHT_SKY_TINT = 0.08
+LIGHT_SKY_TINT_SUN = 0.12
+WATER_REFLECT = 0.2
+WATER_REFLECT_SUN = 0.35
+WATER_SPEC_POWER = 12
+WATER_SPEC = 0.45
+WATER_SPEC_SUN = 0.35
+VIEW3D_WATER_REFLECT = 0.12
+VIEW3D_WATER_REFLECT_SUN = 0.25
+LIGHTING_SKY_STEP = 8
+LIGHTING_CACHE_BYTES = 64 * 1024 * 1024
 VIEW3D_RES_SCALE_MIN = 0.5
 VIEW3D_RES_SCALE_MAX = 1.0
 VIEW3D_RES_SCALE_STEP = 0.05
@@ -66,6 +170,97 @@ LAW_TEMP_OFFSET_MAX = 0.5
 LAW_GRAVITY_STEP = 0.1
 LAW_GRAVITY_MIN = 0.2
 LAW_GRAVITY_MAX = 2.0
+SIM_BACKENDS = ("auto", "python", "numpy")
+AGENT_MODES = ("sequential", "batched")
+RNG_MODES = ("lcg", "counter")
+COUNTER_STREAMS = (
+    "cells",
+    "spawn",
+    "herbivore_move",
+    "herbivore_spawn",
+    "predator_move",
+    "predator_prey",
+    "predator_spawn",
+)
+
+
+_LCG_JUMP_TABLES: Dict[int, Tuple[object, object]] = {}
+
+
+def _lcg_jump_tables(count: int):
+    # state_k = A_k * state_0 + C_k (mod 2**32); uint64 products wrap mod 2**64,
+    # which is still exact mod 2**32.
+    tables = _LCG_JUMP_TABLES.get(count)
+    if tables is None:
+        mult = np.cumprod(np.full(count, LCG_MULTIPLIER, dtype=np.uint64))
+        powers = np.empty(count, dtype=np.uint64)
+        powers[0] = 1
+        powers[1:] = mult[:-1]
+        inc = np.cumsum(powers) * np.uint64(LCG_INCREMENT)
+        tables = (mult & np.uint64(MASK32), inc & np.uint64(MASK32))
+        if len(_LCG_JUMP_TABLES) >= 8:
+            _LCG_JUMP_TABLES.clear()
+        _LCG_JUMP_TABLES[count] = tables
+    return tables
+
+
+def splitmix64(value: int) -> int:
+    value = (value + 0x9E3779B97F4A7C15) & MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+    return value ^ (value >> 31)
+
+
+def squares32(counter: int, key: int) -> int:
+    # Widynski's "Squares" counter-based generator: four middle-square rounds.
+    x = y = (counter * key) & MASK64
+    z = (y + key) & MASK64
+    x = (x * x + y) & MASK64
+    x = ((x >> 32) | (x << 32)) & MASK64
+    x = (x * x + z) & MASK64
+    x = ((x >> 32) | (x << 32)) & MASK64
+    x = (x * x + y) & MASK64
+    x = ((x >> 32) | (x << 32)) & MASK64
+    return ((x * x + z) & MASK64) >> 32
+
+
+def squares32_array(counters, key: int):
+    # Vectorized squares32; uint64 arithmetic wraps mod 2**64 like the masks above.
+    key = np.uint64(key)
+    half = np.uint64(32)
+    x = counters * key
+    y = x
+    z = y + key
+    x = x * x + y
+    x = (x >> half) | (x << half)
+    x = x * x + z
+    x = (x >> half) | (x << half)
+    x = x * x + y
+    x = (x >> half) | (x << half)
+    return (x * x + z) >> half
+
+
+class CounterRng:
+    """Counter-based stream: each draw is a pure function of (seed, stream, step, entity).
+
+    Nothing is consumed sequentially, so entities can be evaluated in any order,
+    in batches or in parallel. Entities must stay below 2**32.
+    """
+
+    def __init__(self, seed: int, stream: int) -> None:
+        self.key = splitmix64(((seed & MASK64) << 8) ^ stream) | 1
+
+    def draw(self, step: int, entity: int) -> int:
+        return squares32(((step & MASK32) << 32) | entity, self.key)
+
+    def draw_block(self, step: int, entities) -> List[int]:
+        base = (step & MASK32) << 32
+        key = self.key
+        return [squares32(base | entity, key) for entity in entities]
+
+    def draw_array(self, step: int, entities):
+        base = np.uint64((step & MASK32) << 32)
+        return squares32_array(np.asarray(entities, dtype=np.uint64) | base, self.key)
 
 
 class LcgRng:
@@ -73,39 +268,274 @@ class LcgRng:
         self.state = seed & MASK32
 
     def next_u32(self) -> int:
-        self.state = (1664525 * self.state + 1013904223) & MASK32
+        self.state = (LCG_MULTIPLIER * self.state + LCG_INCREMENT) & MASK32
         return self.state
 
+    def next_block(self, count: int) -> List[int]:
+        return [self.next_u32() for _ in range(count)]
+
+    def next_array(self, count: int):
+        # Same values as next_block(count), generated by LCG jump-ahead.
+        if count <= 0:
+            return np.zeros(0, dtype=np.uint64)
+        mult, inc = _lcg_jump_tables(count)
+        values = (mult * np.uint64(self.state) + inc) & np.uint64(MASK32)
+        self.state = int(values[-1])
+        return values
+
+
+_NEIGHBOUR_DX = np.array([0, 1, -1, 0, 0]) if np is not None else None
+_NEIGHBOUR_DY = np.array([0, 0, 0, 1, -1]) if np is not None else None
+
+
+def _bucket_order(keys):
+    # Stable order of non-negative integer keys in linear time: numpy's stable
+    # sort is an LSD radix sort for 16-bit integers, so order by the low 16 bits
+    # and, for grids past 65536 cells, then by the high bits.
+    order = np.argsort((keys & 0xFFFF).astype(np.uint16), kind="stable")
+    high = keys >> 16
+    if high.any():
+        order = order[np.argsort(high[order].astype(np.uint16), kind="stable")]
+    return order
+
+
+def _nth_true(mask, draws):
+    # Column of the (draw % count)-th True in each row, or -1 for empty rows.
+    counts = mask.sum(axis=1)
+    pick = draws % np.maximum(counts, 1)
+    rank = np.cumsum(mask, axis=1) - 1
+    chosen = mask & (rank == pick[:, None])
+    return np.where(counts > 0, chosen.argmax(axis=1), -1)
+
+
+class AgentStore:
+    """Structure-of-arrays agent population backed by compact typed buffers.
+
+    Positions are int16 and energies float64 (float32 would change the digest).
+    Update kernels overwrite survivors in place, queue births, then call
+    finish() which shifts survivors from the back so each child lands right
+    after its parent, matching the order of the old list rebuild. energy_total
+    is kept current by every mutation, from sums the kernels pass to finish().
+    """
+
+    def __init__(self) -> None:
+        self.version = 0
+        self.energy_total = 0.0
+        self.x = array("h")
+        self.y = array("h")
+        self.energy = array("d")
+        self._birth_slot = array("l")
+        self._birth_x = array("h")
+        self._birth_y = array("h")
+        self._birth_energy = array("d")
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def append(self, x: int, y: int, energy: float) -> None:
+        self.version += 1
+        self.x.append(x)
+        self.y.append(y)
+        self.energy.append(energy)
+        self.energy_total += energy
+
+    def clear(self) -> None:
+        self.version += 1
+        self.energy_total = 0.0
+        del self.x[:]
+        del self.y[:]
+        del self.energy[:]
+
+    def add_birth(self, parent_slot: int, x: int, y: int, energy: float) -> None:
+        self._birth_slot.append(parent_slot)
+        self._birth_x.append(x)
+        self._birth_y.append(y)
+        self._birth_energy.append(energy)
+
+    def finish(self, count: int, energy_total: Optional[float] = None) -> None:
+        # energy_total is the survivors' energy sum when the kernel tracked it;
+        # queued births are added here.
+        self.version += 1
+        xs = self.x
+        ys = self.y
+        energies = self.energy
+        del xs[count:]
+        del ys[count:]
+        del energies[count:]
+        if energy_total is None:
+            energy_total = sum(energies)
+        births = len(self._birth_slot)
+        self.energy_total = energy_total + sum(self._birth_energy)
+        if not births:
+            return
+        xs.extend(self._birth_x)
+        ys.extend(self._birth_y)
+        energies.extend(self._birth_energy)
+        read = count - 1
+        write = count + births - 1
+        for birth in range(births - 1, -1, -1):
+            parent = self._birth_slot[birth]
+            while read > parent:
+                xs[write] = xs[read]
+                ys[write] = ys[read]
+                energies[write] = energies[read]
+                write -= 1
+                read -= 1
+            xs[write] = self._birth_x[birth]
+            ys[write] = self._birth_y[birth]
+            energies[write] = self._birth_energy[birth]
+            write -= 1
+        del self._birth_slot[:]
+        del self._birth_x[:]
+        del self._birth_y[:]
+        del self._birth_energy[:]
+
+    def assign(self, x, y, energy) -> None:
+        # Replaces the population with int16/float64 numpy buffers.
+        self.clear()
+        self.x.frombytes(x.tobytes())
+        self.y.frombytes(y.tobytes())
+        self.energy.frombytes(energy.tobytes())
+        self.energy_total = float(energy.sum())
+
+    def remove(self, slots: List[int]) -> None:
+        # Drops the given ascending slots; only agents after the first removed
+        # slot are shifted down.
+        if not slots:
+            return
+        xs = self.x
+        ys = self.y
+        energies = self.energy
+        size = len(xs)
+        remaining = self.energy_total - sum(energies[slot] for slot in slots)
+        count = slots[0]
+        for pos, slot in enumerate(slots):
+            end = slots[pos + 1] if pos + 1 < len(slots) else size
+            for idx in range(slot + 1, end):
+                xs[count] = xs[idx]
+                ys[count] = ys[idx]
+                energies[count] = energies[idx]
+                count += 1
+        self.finish(count, remaining)
+
+
+class SpatialIndex:
+    """Sparse cell -> agent-slot buckets for one AgentStore.
+
+    Only occupied cells get a bucket, so building and querying scale with the
+    population rather than the grid. Slots within a bucket are ascending.
+    Deaths and births renumber slots every step, so the python herbivore
+    kernels refill the buckets as they move each survivor: reset() at the
+    start of the pass, add() for each survivor and child under its final slot,
+    then mark() once the store is finished. Predation takes eaten prey out in
+    place with take(). sync() is the O(agents) fallback for any other change
+    (spawns, restore, the numpy batched kernel) and does nothing while the
+    index matches the store's version.
+    """
+
+    def __init__(self, width: int) -> None:
+        self.width = width
+        self.buckets: Dict[int, List[int]] = {}
+        self.version = -1
+
+    def sync(self, store: AgentStore) -> None:
+        if self.version == store.version:
+            return
+        buckets = self.buckets
+        buckets.clear()
+        width = self.width
+        for slot, (x, y) in enumerate(zip(store.x, store.y)):
+            cell = y * width + x
+            bucket = buckets.get(cell)
+            if bucket is None:
+                buckets[cell] = [slot]
+            else:
+                bucket.append(slot)
+        self.version = store.version
+
+    def reset(self) -> None:
+        self.buckets.clear()
+        self.version = -1
+
+    def add(self, cell: int, slot: int) -> None:
+        # Slots may arrive out of order (children placed after their parents
+        # are added last), so keep each bucket sorted.
+        bucket = self.buckets.get(cell)
+        if bucket is None:
+            self.buckets[cell] = [slot]
+        elif slot > bucket[-1]:
+            bucket.append(slot)
+        else:
+            bisect.insort(bucket, slot)
+
+    def mark(self, store: AgentStore) -> None:
+        self.version = store.version
+
+    def count(self, cell: int) -> int:
+        bucket = self.buckets.get(cell)
+        return len(bucket) if bucket else 0
+
+    def take(self, cell: int, pick: int) -> int:
+        # Removes and returns the pick-th slot in the cell's bucket.
+        bucket = self.buckets[cell]
+        slot = bucket.pop(pick)
+        if not bucket:
+            del self.buckets[cell]
+        self.version = -1
+        return slot
+
 
 class Simulation:
-    def __init__(self, width: int, height: int, seed: int, rainfall_scale: float = 1.0) -> None:
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        seed: int,
+        rainfall_scale: float = 1.0,
+        backend: str = "auto",
+        agent_mode: str = "sequential",
+        rng_mode: str = "lcg",
+    ) -> None:
+        if agent_mode not in AGENT_MODES:
+            raise ValueError(f"Unknown agent mode {agent_mode!r}; expected one of {', '.join(AGENT_MODES)}.")
+        if rng_mode not in RNG_MODES:
+            raise ValueError(f"Unknown RNG mode {rng_mode!r}; expected one of {', '.join(RNG_MODES)}.")
         self.width = width
         self.height = height
         self.seed = seed
+        self.backend = resolve_backend(backend)
+        self.agent_mode = agent_mode
+        self.rng_mode = rng_mode
         self.rng = LcgRng(seed)
+        self.counter_rng: Optional[Dict[str, CounterRng]] = None
+        if rng_mode == "counter":
+            self.counter_rng = {
+                name: CounterRng(seed, stream) for stream, name in enumerate(COUNTER_STREAMS)
+            }
         self.tick = 0
+        self.step_index = 0
+        self.spawn_index = 0
         size = width * height
-        self.cells = [self.rng.next_u32() for _ in range(size)]
-        heights, temps, rains = build_fields(width, height, seed)
+        self.cells = self._cell_draws(size)
+        heights, temps, rains, flow_accum, river_mask, river_strength = WORLD_CACHE.get(
+            seed, width, height, rainfall_scale
+        )
         self.heights = heights
         self.base_temperature = [temp / 255.0 for temp in temps]
         self.rainfall_scale = rainfall_scale
         self.base_rainfall = [clamp_unit((rain / 255.0) * rainfall_scale) for rain in rains]
-        self.flow_accum, self.river_mask, self.river_strength = build_flow_fields(
-            heights, self.base_rainfall, width, height
-        )
+        self.flow_accum = flow_accum
+        self.river_mask = river_mask
+        self.river_strength = river_strength
         self.temperature = list(self.base_temperature)
         self.rainfall = list(self.base_rainfall)
         self.water_mask = [height < WATER_LEVEL for height in heights]
         self.moisture = [0.0 for _ in range(size)]
         self.plant_biomass = [0.0 for _ in range(size)]
         self.agent_rng = LcgRng(seed ^ 0x5F356495)
-        self.herbivore_x: List[int] = []
-        self.herbivore_y: List[int] = []
-        self.herbivore_energy: List[float] = []
-        self.predator_x: List[int] = []
-        self.predator_y: List[int] = []
-        self.predator_energy: List[float] = []
+        self.herbivores = AgentStore()
+        self.predators = AgentStore()
+        self.prey_index = SpatialIndex(width)
         for idx in range(size):
             if self.water_mask[idx]:
                 self.moisture[idx] = 1.0
@@ -120,6 +550,33 @@ class Simulation:
                 self.moisture[idx] = clamp_unit(base_moisture)
                 plant = 0.5 * self.base_rainfall[idx] + 0.5 * self.base_temperature[idx]
                 self.plant_biomass[idx] = clamp_unit(plant)
+        # Running field totals, kept current by the update kernels; see stats().
+        self.plant_total = sum(self.plant_biomass)
+        self.moisture_total = sum(self.moisture)
+        if self.backend == "numpy":
+            self._init_climate_arrays()
+
+    def _init_climate_arrays(self) -> None:
+        # Same values as the list fields, stored as float64 so whole-array
+        # updates round exactly like the per-cell Python arithmetic.
+        self.base_temperature = np.array(self.base_temperature, dtype=np.float64)
+        self.base_rainfall = np.array(self.base_rainfall, dtype=np.float64)
+        self.river_strength = np.array(self.river_strength, dtype=np.float64)
+        self.temperature = self.base_temperature.copy()
+        self.rainfall = self.base_rainfall.copy()
+        self.moisture = np.array(self.moisture, dtype=np.float64)
+        self.plant_biomass = np.array(self.plant_biomass, dtype=np.float64)
+        # max(max(m, river_floor), 0.85) == max(m, max(river_floor, 0.85)), so the
+        # river and open-water floors fold into one per-cell lower bound.
+        floor = np.full(self.width * self.height, -np.inf)
+        rivers = self.river_strength > 0.0
+        floor[rivers] = RIVER_MOISTURE_FLOOR + RIVER_MOISTURE_RANGE * self.river_strength[rivers]
+        water = np.array(self.water_mask, dtype=bool)
+        floor[water] = np.maximum(floor[water], 0.85)
+        self._moisture_floor = floor
+        self._river_gain = self.river_strength * RIVER_MOISTURE_GAIN
+        self._land_mask = ~water
+        self._land_weight = np.where(water, 0.0, 1.0)
 
     def spawn_herbivores(self, count: int) -> int:
         land_indices = [idx for idx, water in enumerate(self.water_mask) if not water]
@@ -127,11 +584,12 @@ class Simulation:
             return 0
         spawned = 0
         for _ in range(count):
-            idx = land_indices[self.agent_rng.next_u32() % len(land_indices)]
-            self.herbivore_x.append(idx % self.width)
-            self.herbivore_y.append(idx // self.width)
+            idx = land_indices[self._agent_draw("spawn", self.spawn_index) % len(land_indices)]
+            self.spawn_index += 1
             energy = HERBIVORE_START_ENERGY + 0.4 * self.plant_biomass[idx]
-            self.herbivore_energy.append(clamp_range(energy, 0.2, HERBIVORE_MAX_ENERGY))
+            self.herbivores.append(
+                idx % self.width, idx // self.width, clamp_range(energy, 0.2, HERBIVORE_MAX_ENERGY)
+            )
             spawned += 1
         return spawned
 
@@ -141,21 +599,198 @@ class Simulation:
             return 0
         spawned = 0
         for _ in range(count):
-            idx = land_indices[self.agent_rng.next_u32() % len(land_indices)]
-            self.predator_x.append(idx % self.width)
-            self.predator_y.append(idx // self.width)
+            idx = land_indices[self._agent_draw("spawn", self.spawn_index) % len(land_indices)]
+            self.spawn_index += 1
             energy = PREDATOR_START_ENERGY + 0.2 * self.plant_biomass[idx]
-            self.predator_energy.append(clamp_range(energy, 0.3, PREDATOR_MAX_ENERGY))
+            self.predators.append(
+                idx % self.width, idx // self.width, clamp_range(energy, 0.3, PREDATOR_MAX_ENERGY)
+            )
             spawned += 1
         return spawned
 
+    @property
+    def herbivore_x(self) -> array:
+        return self.herbivores.x
+
+    @property
+    def herbivore_y(self) -> array:
+        return self.herbivores.y
+
+    @property
+    def herbivore_energy(self) -> array:
+        return self.herbivores.energy
+
+    @property
+    def predator_x(self) -> array:
+        return self.predators.x
+
+    @property
+    def predator_y(self) -> array:
+        return self.predators.y
+
+    @property
+    def predator_energy(self) -> array:
+        return self.predators.energy
+
     def clear_agents(self) -> None:
-        self.herbivore_x = []
-        self.herbivore_y = []
-        self.herbivore_energy = []
-        self.predator_x = []
-        self.predator_y = []
-        self.predator_energy = []
+        self.herbivores.clear()
+        self.predators.clear()
+
+    def snapshot(self) -> bytes:
+        """All evolving state as compact little-endian bytes for restore().
+
+        The world (heights, base climate, rivers) is not included: it is rebuilt
+        from the seed, so a snapshot can also be restored into a simulation of
+        the same seed and size built with a different rainfall_scale. The seed
+        is stored masked to 64 bits; agent and RNG modes are recorded because
+        they change the rules the state evolves under.
+        """
+        size = self.width * self.height
+        parts = [
+            SNAPSHOT_MAGIC,
+            struct.pack(
+                SNAPSHOT_HEADER,
+                self.seed & MASK64,
+                self.width,
+                self.height,
+                self.tick,
+                self.step_index,
+                self.spawn_index,
+                self.rng.state,
+                self.agent_rng.state,
+                len(self.herbivores),
+                len(self.predators),
+                self.plant_total,
+                self.moisture_total,
+                AGENT_MODES.index(self.agent_mode),
+                RNG_MODES.index(self.rng_mode),
+            ),
+        ]
+        if np is not None and isinstance(self.cells, np.ndarray):
+            parts.append(self.cells.astype("<u4").tobytes())
+        else:
+            parts.append(struct.pack(f"<{size}I", *self.cells))
+        for field in (self.temperature, self.rainfall, self.moisture, self.plant_biomass):
+            if np is not None and isinstance(field, np.ndarray):
+                parts.append(field.astype("<f8").tobytes())
+            else:
+                parts.append(struct.pack(f"<{size}d", *field))
+        for store in (self.herbivores, self.predators):
+            count = len(store)
+            parts.append(struct.pack(f"<{count}h", *store.x))
+            parts.append(struct.pack(f"<{count}h", *store.y))
+            parts.append(struct.pack(f"<{count}d", *store.energy))
+        return b"".join(parts)
+
+    def restore(self, data: bytes) -> None:
+        header_size = len(SNAPSHOT_MAGIC) + struct.calcsize(SNAPSHOT_HEADER)
+        if not data.startswith(SNAPSHOT_MAGIC) or len(data) < header_size:
+            raise ValueError("Not a microverse snapshot.")
+        (
+            seed,
+            width,
+            height,
+            tick,
+            step_index,
+            spawn_index,
+            rng_state,
+            agent_rng_state,
+            herbivores,
+            predators,
+            plant_total,
+            moisture_total,
+            agent_mode,
+            rng_mode,
+        ) = struct.unpack_from(SNAPSHOT_HEADER, data, len(SNAPSHOT_MAGIC))
+        if (seed, width, height) != (self.seed & MASK64, self.width, self.height):
+            raise ValueError(
+                f"Snapshot is for seed {seed} at {width}x{height}, "
+                f"not seed {self.seed & MASK64} at {self.width}x{self.height}."
+            )
+        modes = (
+            AGENT_MODES[agent_mode] if agent_mode < len(AGENT_MODES) else str(agent_mode),
+            RNG_MODES[rng_mode] if rng_mode < len(RNG_MODES) else str(rng_mode),
+        )
+        if modes != (self.agent_mode, self.rng_mode):
+            raise ValueError(
+                f"Snapshot is from agent mode {modes[0]!r} with RNG mode {modes[1]!r}, "
+                f"not {self.agent_mode!r} with {self.rng_mode!r}."
+            )
+        size = width * height
+        if len(data) != header_size + size * 36 + (herbivores + predators) * 12:
+            raise ValueError("Truncated microverse snapshot.")
+        offset = header_size
+
+        def take(fmt: str, count: int):
+            nonlocal offset
+            values = struct.unpack_from(f"<{count}{fmt}", data, offset)
+            offset += struct.calcsize(f"<{count}{fmt}")
+            return values
+
+        if self.backend == "numpy":
+            # Copies, so the restored fields are writable and native-endian.
+            self.cells = np.frombuffer(data, dtype="<u4", count=size, offset=offset).astype(np.uint32)
+            offset += size * 4
+            fields = []
+            for _ in range(4):
+                fields.append(np.frombuffer(data, dtype="<f8", count=size, offset=offset).astype(np.float64))
+                offset += size * 8
+        else:
+            self.cells = list(take("I", size))
+            fields = [list(take("d", size)) for _ in range(4)]
+        self.temperature, self.rainfall, self.moisture, self.plant_biomass = fields
+        for store, count in ((self.herbivores, herbivores), (self.predators, predators)):
+            store.clear()
+            store.x.extend(take("h", count))
+            store.y.extend(take("h", count))
+            store.energy.extend(take("d", count))
+            store.energy_total = sum(store.energy)
+        self.tick = tick
+        self.step_index = step_index
+        self.spawn_index = spawn_index
+        self.rng.state = rng_state
+        self.agent_rng.state = agent_rng_state
+        self.plant_total = plant_total
+        self.moisture_total = moisture_total
+
+    def stats(self) -> Dict[str, float]:
+        """Grid and population aggregates, maintained incrementally by step()."""
+        size = max(1, self.width * self.height)
+        return {
+            "plant_total": self.plant_total,
+            "plant_mean": self.plant_total / size,
+            "moisture_total": self.moisture_total,
+            "moisture_mean": self.moisture_total / size,
+            "herbivores": len(self.herbivores),
+            "predators": len(self.predators),
+            "herbivore_energy": self.herbivores.energy_total,
+            "predator_energy": self.predators.energy_total,
+        }
+
+    def _cell_draws(self, count: int):
+        # A list on the python backend, a uint32 array on numpy; same values.
+        if self.backend == "numpy":
+            if self.counter_rng is None:
+                return self.rng.next_array(count).astype(np.uint32)
+            return self.counter_rng["cells"].draw_array(self.step_index, np.arange(count)).astype(np.uint32)
+        if self.counter_rng is None:
+            return self.rng.next_block(count)
+        return self.counter_rng["cells"].draw_block(self.step_index, range(count))
+
+    def _agent_draw(self, stream: str, entity: int) -> int:
+        if self.counter_rng is None:
+            return self.agent_rng.next_u32()
+        return self.counter_rng[stream].draw(self.step_index, entity)
+
+    def _agent_draws(self, stream: str, entities):
+        # One draw per entity: a list on the python backend, a uint64 array on numpy.
+        if self.counter_rng is None:
+            if self.backend == "numpy":
+                return self.agent_rng.next_array(len(entities))
+            return self.agent_rng.next_block(len(entities))
+        if self.backend == "numpy":
+            return self.counter_rng[stream].draw_array(self.step_index, entities)
+        return self.counter_rng[stream].draw_block(self.step_index, entities)
 
     def step(
         self,
@@ -164,25 +799,61 @@ class Simulation:
         rain_multiplier: float = 1.0,
         gravity: float = 1.0,
     ) -> None:
+        self.update_cells(dt)
+        if dt <= 0.0:
+            return
+        self.update_climate(dt, temp_offset, rain_multiplier)
+        self.update_plants(dt)
+        self.update_herbivores(dt, gravity)
+        self.update_predators(dt, gravity)
+
+    def update_cells(self, dt: float) -> None:
         dt_scaled = int(dt * 1000)
         self.tick = (self.tick + dt_scaled) & MASK32
+        self.step_index += 1
+        if self.backend == "numpy":
+            self._update_cells_numpy()
+        else:
+            self._update_cells_python()
+
+    def update_climate(self, dt: float, temp_offset: float = 0.0, rain_multiplier: float = 1.0) -> None:
+        sim_time = self.tick / 1000.0
+        season_phase = (sim_time / 120.0) * 2.0 * math.pi
+        temp_shift = 0.08 * math.sin(season_phase) + temp_offset
+        rain_factor = (0.8 + 0.2 * math.sin(season_phase + 1.3)) * rain_multiplier
+        if self.backend == "numpy":
+            self._update_climate_numpy(dt, temp_shift, rain_factor)
+        else:
+            self._update_climate_python(dt, temp_shift, rain_factor)
+
+    def _update_cells_python(self) -> None:
         w = self.width
         h = self.height
         cells = self.cells
+        draws = self._cell_draws(len(cells))
         next_cells = [0] * len(cells)
         for idx, val in enumerate(cells):
             left = cells[idx - 1] if idx % w else cells[idx + w - 1]
             up = cells[idx - w] if idx >= w else cells[idx + (h - 1) * w]
-            mix = (val + left + up + self.rng.next_u32() + self.tick) & MASK32
+            mix = (val + left + up + draws[idx] + self.tick) & MASK32
             mix ^= ((mix << 13) & MASK32) ^ (mix >> 7)
             next_cells[idx] = mix
         self.cells = next_cells
-        if dt <= 0.0:
-            return
-        sim_time = self.tick / 1000.0
-        season_phase = (sim_time / 120.0) * 2.0 * math.pi
-        temp_shift = 0.08 * math.sin(season_phase) + temp_offset
-        rain_factor = (0.8 + 0.2 * math.sin(season_phase + 1.3)) * rain_multiplier
+
+    def _update_cells_numpy(self) -> None:
+        # Left/up neighbours wrap within the row/column, i.e. rolls of the old
+        # grid; uint32 adds and shifts wrap exactly like the & MASK32 masks.
+        grid = self.cells.reshape(self.height, self.width)
+        mix = np.roll(grid, 1, axis=1)
+        mix += np.roll(grid, 1, axis=0)
+        mix += grid
+        mix += self._cell_draws(self.cells.size).reshape(grid.shape)
+        mix += np.uint32(self.tick)
+        mix ^= (mix << np.uint32(13)) ^ (mix >> np.uint32(7))
+        self.cells = mix.reshape(-1)
+
+    def _update_climate_python(self, dt: float, temp_shift: float, rain_factor: float) -> None:
+        total = 0.0
         for idx in range(len(self.moisture)):
             temp = clamp_unit(self.base_temperature[idx] + temp_shift)
             rain = clamp_unit(self.base_rainfall[idx] * rain_factor)
@@ -199,14 +870,40 @@ class Simulation:
                 moisture = max(moisture, RIVER_MOISTURE_FLOOR + RIVER_MOISTURE_RANGE * river_strength)
             if self.water_mask[idx]:
                 moisture = max(0.85, moisture)
-            self.moisture[idx] = clamp_unit(moisture)
-        self.update_plants(dt)
-        self.update_herbivores(dt, gravity)
-        self.update_predators(dt, gravity)
+            moisture = clamp_unit(moisture)
+            self.moisture[idx] = moisture
+            total += moisture
+        self.moisture_total = total
+
+    def _update_climate_numpy(self, dt: float, temp_shift: float, rain_factor: float) -> None:
+        # Operations keep the scalar path's evaluation order so every cell
+        # rounds identically and digest() matches bit for bit.
+        temp = self.temperature
+        np.add(self.base_temperature, temp_shift, out=temp)
+        np.clip(temp, 0.0, 1.0, out=temp)
+        rain = self.rainfall
+        np.multiply(self.base_rainfall, rain_factor, out=rain)
+        np.clip(rain, 0.0, 1.0, out=rain)
+        rain_add = rain * 0.1 * dt
+        evaporation = (0.01 + 0.05 * temp) * dt
+        plant_use = self.plant_biomass * 0.04 * dt
+        river_add = self._river_gain * dt
+        moisture = self.moisture
+        moisture += rain_add
+        moisture -= evaporation
+        moisture -= plant_use
+        moisture += river_add
+        np.maximum(moisture, self._moisture_floor, out=moisture)
+        np.clip(moisture, 0.0, 1.0, out=moisture)
+        self.moisture_total = float(moisture.sum())
 
     def update_plants(self, dt: float) -> None:
         if dt <= 0.0:
             return
+        if self.backend == "numpy":
+            self._update_plants_numpy(dt)
+            return
+        total = 0.0
         for idx in range(len(self.plant_biomass)):
             if self.water_mask[idx]:
                 self.plant_biomass[idx] = 0.0
@@ -215,21 +912,55 @@ class Simulation:
             light = clamp_unit(0.3 + 0.7 * self.temperature[idx])
             growth = light * moisture * PLANT_GROWTH_RATE * dt
             decay = (PLANT_DECAY_BASE + PLANT_DECAY_DRY * (1.0 - moisture)) * dt
-            biomass = self.plant_biomass[idx] + growth - decay
-            self.plant_biomass[idx] = clamp_unit(biomass)
+            biomass = clamp_unit(self.plant_biomass[idx] + growth - decay)
+            self.plant_biomass[idx] = biomass
+            total += biomass
+        self.plant_total = total
+
+    def _update_plants_numpy(self, dt: float) -> None:
+        moisture = self.moisture
+        light = 0.3 + 0.7 * self.temperature
+        np.clip(light, 0.0, 1.0, out=light)
+        growth = light
+        growth *= moisture
+        growth *= PLANT_GROWTH_RATE
+        growth *= dt
+        decay = 1.0 - moisture
+        decay *= PLANT_DECAY_DRY
+        decay += PLANT_DECAY_BASE
+        decay *= dt
+        biomass = self.plant_biomass
+        biomass += growth
+        biomass -= decay
+        np.clip(biomass, 0.0, 1.0, out=biomass)
+        # Clamped biomass is finite, so weighting by 0.0 zeroes water cells exactly.
+        biomass *= self._land_weight
+        self.plant_total = float(biomass.sum())
 
     def update_herbivores(self, dt: float, gravity: float = 1.0) -> None:
-        if dt <= 0.0 or not self.herbivore_x:
+        store = self.herbivores
+        if dt <= 0.0 or not store:
+            return
+        if self.agent_mode == "batched":
+            if self.backend == "numpy":
+                self._update_herbivores_batched_numpy(dt, gravity)
+            else:
+                self._update_herbivores_batched_python(dt, gravity)
             return
         width = self.width
         height = self.height
-        next_x: List[int] = []
-        next_y: List[int] = []
-        next_energy: List[float] = []
-        for idx in range(len(self.herbivore_x)):
-            x = self.herbivore_x[idx]
-            y = self.herbivore_y[idx]
-            energy = self.herbivore_energy[idx]
+        xs = store.x
+        ys = store.y
+        energies = store.energy
+        prey_index = self.prey_index
+        prey_index.reset()
+        count = 0
+        births = 0
+        energy_total = 0.0
+        for idx in range(len(store)):
+            x = xs[idx]
+            y = ys[idx]
+            energy = energies[idx]
             best_biomass = -1.0
             best_positions: List[Tuple[int, int]] = []
             for dx, dy in ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)):
@@ -247,13 +978,15 @@ class Simulation:
                 elif abs(biomass - best_biomass) <= 1e-6:
                     best_positions.append((nx, ny))
             if best_positions:
-                choice = best_positions[self.agent_rng.next_u32() % len(best_positions)]
+                choice = best_positions[self._agent_draw("herbivore_move", idx) % len(best_positions)]
                 x, y = choice
             pos_idx = y * width + x
             available = self.plant_biomass[pos_idx]
             eat = min(available, HERBIVORE_EAT_RATE * dt)
             if eat > 0.0:
-                self.plant_biomass[pos_idx] = clamp_unit(available - eat)
+                remaining = clamp_unit(available - eat)
+                self.plant_biomass[pos_idx] = remaining
+                self.plant_total -= available - remaining
             energy += eat * HERBIVORE_EAT_GAIN
             energy -= HERBIVORE_METABOLISM * dt * gravity
             if energy <= 0.0:
@@ -262,34 +995,203 @@ class Simulation:
             reproduced = energy >= HERBIVORE_REPRO_ENERGY
             if reproduced:
                 energy *= 0.5
-            next_x.append(x)
-            next_y.append(y)
-            next_energy.append(energy)
+            xs[count] = x
+            ys[count] = y
+            energies[count] = energy
+            energy_total += energy
+            # After finish() each child sits right after its parent.
+            prey_index.add(pos_idx, count + births)
             if reproduced:
-                child_x, child_y = self._pick_spawn(x, y)
-                next_x.append(child_x)
-                next_y.append(child_y)
-                next_energy.append(energy)
-        self.herbivore_x = next_x
-        self.herbivore_y = next_y
-        self.herbivore_energy = next_energy
+                child_x, child_y = self._spawn_choice(
+                    x, y, lambda: self._agent_draw("herbivore_spawn", idx)
+                )
+                store.add_birth(count, child_x, child_y, energy)
+                births += 1
+                prey_index.add(child_y * width + child_x, count + births)
+            count += 1
+        store.finish(count, energy_total)
+        prey_index.mark(store)
+
+    def _update_herbivores_batched_python(self, dt: float, gravity: float) -> None:
+        # Batched semantics: every herbivore picks its move from the same
+        # pre-grazing biomass snapshot using one RNG draw, then herbivores
+        # sharing a cell graze in index order (rank k eats what is left after
+        # k full bites). The numpy kernel must match this loop exactly.
+        store = self.herbivores
+        width = self.width
+        height = self.height
+        plants = self.plant_biomass
+        count = len(store)
+        draws = self._agent_draws("herbivore_move", range(count))
+        bite = HERBIVORE_EAT_RATE * dt
+        cells: List[int] = []
+        for idx in range(count):
+            x = store.x[idx]
+            y = store.y[idx]
+            positions: List[Tuple[int, int]] = []
+            values: List[float] = []
+            for dx, dy in ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)):
+                nx = x + dx
+                ny = y + dy
+                if nx < 0 or nx >= width or ny < 0 or ny >= height:
+                    continue
+                nidx = ny * width + nx
+                if self.water_mask[nidx]:
+                    continue
+                positions.append((nx, ny))
+                values.append(plants[nidx])
+            if positions:
+                best = max(values)
+                ties = [pos for pos, value in zip(positions, values) if value >= best - 1e-6]
+                x, y = ties[draws[idx] % len(ties)]
+            store.x[idx] = x
+            store.y[idx] = y
+            cells.append(y * width + x)
+        grazers: Dict[int, int] = {}
+        eaten: List[float] = []
+        for cell in cells:
+            rank = grazers.get(cell, 0)
+            grazers[cell] = rank + 1
+            eaten.append(min(max(plants[cell] - rank * bite, 0.0), bite))
+        for cell, grazer_count in grazers.items():
+            remaining = max(plants[cell] - grazer_count * bite, 0.0)
+            self.plant_total -= plants[cell] - remaining
+            plants[cell] = remaining
+        self._finish_herbivores_batched(eaten, dt, gravity)
+
+    def _finish_herbivores_batched(self, eaten: List[float], dt: float, gravity: float) -> None:
+        store = self.herbivores
+        width = self.width
+        cost = HERBIVORE_METABOLISM * dt * gravity
+        prey_index = self.prey_index
+        prey_index.reset()
+        parents: List[int] = []
+        count = 0
+        energy_total = 0.0
+        for idx, eat in enumerate(eaten):
+            energy = store.energy[idx] + eat * HERBIVORE_EAT_GAIN
+            energy -= cost
+            if energy <= 0.0:
+                continue
+            energy = min(energy, HERBIVORE_MAX_ENERGY)
+            # Final slot once the children of earlier parents are inserted.
+            prey_index.add(store.y[idx] * width + store.x[idx], count + len(parents))
+            if energy >= HERBIVORE_REPRO_ENERGY:
+                energy *= 0.5
+                parents.append(count)
+            store.x[count] = store.x[idx]
+            store.y[count] = store.y[idx]
+            store.energy[count] = energy
+            energy_total += energy
+            count += 1
+        draws = self._agent_draws("herbivore_spawn", parents)
+        for births, (parent, draw) in enumerate(zip(parents, draws)):
+            child_x, child_y = self._spawn_choice(store.x[parent], store.y[parent], lambda: draw)
+            store.add_birth(parent, child_x, child_y, store.energy[parent])
+            prey_index.add(child_y * width + child_x, parent + births + 1)
+        store.finish(count, energy_total)
+        prey_index.mark(store)
+
+    def _update_herbivores_batched_numpy(self, dt: float, gravity: float) -> None:
+        store = self.herbivores
+        width = self.width
+        height = self.height
+        count = len(store)
+        plants = self.plant_biomass
+        draws = self._agent_draws("herbivore_move", np.arange(count)).astype(np.int64)
+        x = np.frombuffer(store.x, dtype=np.int16).astype(np.int64)
+        y = np.frombuffer(store.y, dtype=np.int16).astype(np.int64)
+        nx, ny, valid, nidx = self._neighbourhood_numpy(x, y)
+        values = np.where(valid, plants[nidx], -np.inf)
+        best = values.max(axis=1)
+        ties = valid & (values >= (best - 1e-6)[:, None])
+        col = _nth_true(ties, draws)
+        rows = np.arange(count)
+        moved = col >= 0
+        col = np.maximum(col, 0)
+        x = np.where(moved, nx[rows, col], x)
+        y = np.where(moved, ny[rows, col], y)
+        cells = y * width + x
+        # Group by cell, touching occupied cells only: _bucket_order gives a
+        # linear stable order, bucket starts mark each grazed cell, and a
+        # herbivore's rank is its sorted position minus its bucket's start.
+        order = _bucket_order(cells)
+        sorted_cells = cells[order]
+        starts = np.ones(count, dtype=bool)
+        starts[1:] = sorted_cells[1:] != sorted_cells[:-1]
+        first = np.flatnonzero(starts)
+        rank = np.empty(count, dtype=np.int64)
+        rank[order] = np.arange(count) - first[np.cumsum(starts) - 1]
+        bite = HERBIVORE_EAT_RATE * dt
+        available = plants[cells]
+        eaten = np.minimum(np.maximum(available - rank * bite, 0.0), bite)
+        grazed = sorted_cells[first]
+        grazer_counts = np.diff(np.append(first, count))
+        before = plants[grazed]
+        after = np.maximum(before - grazer_counts * bite, 0.0)
+        plants[grazed] = after
+        self.plant_total -= float((before - after).sum())
+        energy = np.frombuffer(store.energy, dtype=np.float64) + eaten * HERBIVORE_EAT_GAIN
+        energy -= HERBIVORE_METABOLISM * dt * gravity
+        alive = energy > 0.0
+        x = x[alive]
+        y = y[alive]
+        energy = np.minimum(energy[alive], HERBIVORE_MAX_ENERGY)
+        reproduced = energy >= HERBIVORE_REPRO_ENERGY
+        energy[reproduced] *= 0.5
+        parents = np.flatnonzero(reproduced)
+        draws = self._agent_draws("herbivore_spawn", parents).astype(np.int64)
+        px = x[parents]
+        py = y[parents]
+        cx, cy, cvalid, _ = self._neighbourhood_numpy(px, py)
+        ccol = _nth_true(cvalid, draws)
+        crows = np.arange(len(parents))
+        spawned = ccol >= 0
+        ccol = np.maximum(ccol, 0)
+        child_x = np.where(spawned, cx[crows, ccol], px)
+        child_y = np.where(spawned, cy[crows, ccol], py)
+        slots = 1 + reproduced.astype(np.int64)
+        start = np.cumsum(slots) - slots
+        total = int(slots.sum())
+        out_x = np.empty(total, dtype=np.int16)
+        out_y = np.empty(total, dtype=np.int16)
+        out_energy = np.empty(total, dtype=np.float64)
+        out_x[start] = x
+        out_y[start] = y
+        out_energy[start] = energy
+        child_slots = start[parents] + 1
+        out_x[child_slots] = child_x
+        out_y[child_slots] = child_y
+        out_energy[child_slots] = energy[parents]
+        store.assign(out_x, out_y, out_energy)
+
+    def _neighbourhood_numpy(self, x, y):
+        nx = x[:, None] + _NEIGHBOUR_DX
+        ny = y[:, None] + _NEIGHBOUR_DY
+        valid = (nx >= 0) & (nx < self.width) & (ny >= 0) & (ny < self.height)
+        nidx = np.where(valid, ny * self.width + nx, 0)
+        valid &= self._land_mask[nidx]
+        return nx, ny, valid, nidx
 
     def update_predators(self, dt: float, gravity: float = 1.0) -> None:
-        if dt <= 0.0 or not self.predator_x:
+        store = self.predators
+        if dt <= 0.0 or not store:
             return
         width = self.width
         height = self.height
-        prey_alive = [True for _ in range(len(self.herbivore_x))]
-        prey_cells: List[List[int]] = [[] for _ in range(width * height)]
-        for idx, (hx, hy) in enumerate(zip(self.herbivore_x, self.herbivore_y)):
-            prey_cells[hy * width + hx].append(idx)
-        next_x: List[int] = []
-        next_y: List[int] = []
-        next_energy: List[float] = []
-        for idx in range(len(self.predator_x)):
-            x = self.predator_x[idx]
-            y = self.predator_y[idx]
-            energy = self.predator_energy[idx]
+        prey = self.herbivores
+        prey_index = self.prey_index
+        prey_index.sync(prey)
+        eaten: List[int] = []
+        xs = store.x
+        ys = store.y
+        energies = store.energy
+        count = 0
+        energy_total = 0.0
+        for idx in range(len(store)):
+            x = xs[idx]
+            y = ys[idx]
+            energy = energies[idx]
             prey_positions: List[Tuple[int, int]] = []
             plant_positions: List[Tuple[int, int]] = []
             best_prey = 0
@@ -302,7 +1204,7 @@ class Simulation:
                 nidx = ny * width + nx
                 if self.water_mask[nidx]:
                     continue
-                prey_count = len(prey_cells[nidx])
+                prey_count = prey_index.count(nidx)
                 if prey_count:
                     if prey_count > best_prey:
                         best_prey = prey_count
@@ -316,19 +1218,17 @@ class Simulation:
                 elif abs(biomass - best_plant) <= 1e-6:
                     plant_positions.append((nx, ny))
             if prey_positions:
-                choice = prey_positions[self.agent_rng.next_u32() % len(prey_positions)]
+                choice = prey_positions[self._agent_draw("predator_move", idx) % len(prey_positions)]
                 x, y = choice
             elif plant_positions:
-                choice = plant_positions[self.agent_rng.next_u32() % len(plant_positions)]
+                choice = plant_positions[self._agent_draw("predator_move", idx) % len(plant_positions)]
                 x, y = choice
             pos_idx = y * width + x
-            prey_list = prey_cells[pos_idx]
-            if prey_list:
-                prey_pick = self.agent_rng.next_u32() % len(prey_list)
-                prey_idx = prey_list.pop(prey_pick)
-                if prey_alive[prey_idx]:
-                    prey_alive[prey_idx] = False
-                    energy += PREDATOR_EAT_GAIN
+            prey_count = prey_index.count(pos_idx)
+            if prey_count:
+                prey_pick = self._agent_draw("predator_prey", idx) % prey_count
+                eaten.append(prey_index.take(pos_idx, prey_pick))
+                energy += PREDATOR_EAT_GAIN
             energy -= PREDATOR_METABOLISM * dt * gravity
             if energy <= 0.0:
                 continue
@@ -336,49 +1236,36 @@ class Simulation:
             reproduced = energy >= PREDATOR_REPRO_ENERGY
             if reproduced:
                 energy *= 0.5
-            next_x.append(x)
-            next_y.append(y)
-            next_energy.append(energy)
+            xs[count] = x
+            ys[count] = y
+            energies[count] = energy
+            energy_total += energy
             if reproduced:
-                child_x, child_y = self._pick_spawn(x, y)
-                next_x.append(child_x)
-                next_y.append(child_y)
-                next_energy.append(energy)
-        self.predator_x = next_x
-        self.predator_y = next_y
-        self.predator_energy = next_energy
-        if prey_alive:
-            survivors_x: List[int] = []
-            survivors_y: List[int] = []
-            survivors_energy: List[float] = []
-            for alive, hx, hy, he in zip(
-                prey_alive,
-                self.herbivore_x,
-                self.herbivore_y,
-                self.herbivore_energy,
-            ):
-                if alive:
-                    survivors_x.append(hx)
-                    survivors_y.append(hy)
-                    survivors_energy.append(he)
-            self.herbivore_x = survivors_x
-            self.herbivore_y = survivors_y
-            self.herbivore_energy = survivors_energy
-
-    def _pick_spawn(self, x: int, y: int) -> Tuple[int, int]:
+                child_x, child_y = self._spawn_choice(
+                    x, y, lambda: self._agent_draw("predator_spawn", idx)
+                )
+                store.add_birth(count, child_x, child_y, energy)
+            count += 1
+        store.finish(count, energy_total)
+        if eaten:
+            eaten.sort()
+            prey.remove(eaten)
+
+    def _spawn_choice(self, x: int, y: int, draw: Callable[[], int]) -> Tuple[int, int]:
+        # A land cell of the 5-neighbourhood picked by draw(), which is only
+        # called when there is one, so the sequential streams advance as before.
         candidates: List[Tuple[int, int]] = []
         for dx, dy in ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)):
             nx = x + dx
             ny = y + dy
             if nx < 0 or nx >= self.width or ny < 0 or ny >= self.height:
                 continue
-            idx = ny * self.width + nx
-            if self.water_mask[idx]:
+            if self.water_mask[ny * self.width + nx]:
                 continue
             candidates.append((nx, ny))
         if not candidates:
             return x, y
-        return candidates[self.agent_rng.next_u32() % len(candidates)]
+        return candidates[draw() % len(candidates)]
 
     def run_fixed(
         self,
@@ -398,9 +1285,14 @@ class Simulation:
 
     def digest(self) -> str:
         h = hashlib.sha256()
+        if self.rng_mode != "lcg":
+            # Separate lineage: never comparable with LCG-mode digests.
+            h.update(self.rng_mode.encode("ascii"))
         h.update(self.tick.to_bytes(4, "little"))
-        for val in self.cells:
-            h.update(val.to_bytes(4, "little"))
+        if np is not None and isinstance(self.cells, np.ndarray):
+            h.update(self.cells.astype("<u4").tobytes())
+        else:
+            h.update(struct.pack(f"<{len(self.cells)}I", *self.cells))
         for field in (
             self.temperature,
             self.rainfall,
@@ -408,8 +1300,7 @@ class Simulation:
             self.plant_biomass,
             self.river_strength,
         ):
-            for value in field:
-                h.update(clamp_byte(value * 255.0).to_bytes(1, "little"))
+            h.update(field_bytes(field))
         h.update(len(self.herbivore_x).to_bytes(4, "little"))
         for x, y, energy in zip(self.herbivore_x, self.herbivore_y, self.herbivore_energy):
             h.update(x.to_bytes(2, "little"))
@@ -425,6 +1316,23 @@ class Simulation:
         return h.hexdigest()
 
 
+def resolve_backend(backend: str) -> str:
+    if backend not in SIM_BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; expected one of {', '.join(SIM_BACKENDS)}.")
+    if backend == "auto":
+        return "numpy" if np is not None else "python"
+    if backend == "numpy" and np is None:
+        raise SystemExit("numpy is required for the numpy backend. Install with: python -m pip install numpy")
+    return backend
+
+
+def field_bytes(field) -> bytes:
+    # Quantizes a unit field to one byte per cell, exactly like clamp_byte(value * 255.0).
+    if np is not None and isinstance(field, np.ndarray):
+        return np.clip(field * 255.0, 0.0, 255.0).astype(np.uint8).tobytes()
+    return bytes(clamp_byte(value * 255.0) for value in field)
+
+
 def clamp_byte(value: float) -> int:
     if value < 0:
         return 0
@@ -523,8 +1431,76 @@ def build_noise_scales(width: int, height: int) -> List[int]:
     return scales
 
 
+def _hash_unit_array(xs, ys, seed: int):
+    # hash_unit over broadcast uint64 coordinate arrays; the seed term is folded
+    # in Python first so negative seeds wrap exactly like the scalar version.
+    mask = np.uint64(MASK32)
+    n = (xs * np.uint64(374761393) + ys * np.uint64(668265263) + np.uint64((seed * 700001) & MASK32)) & mask
+    n = (n ^ (n >> np.uint64(13))) & mask
+    n = (n * np.uint64(1274126177)) & mask
+    n ^= n >> np.uint64(16)
+    return n / float(MASK32)
+
+
+def _value_noise_grid(width: int, height: int, seed: int, scale: int):
+    xs = np.arange(width, dtype=np.uint64)
+    ys = np.arange(height, dtype=np.uint64)
+    if scale <= 1:
+        return _hash_unit_array(xs[None, :], ys[:, None], seed)
+    cell_x = np.arange(width) // scale
+    cell_y = np.arange(height) // scale
+    u = smoothstep((np.arange(width) - cell_x * scale) / float(scale))
+    v = smoothstep((np.arange(height) - cell_y * scale) / float(scale))
+    # Hash each lattice corner once, then gather the four corners per cell.
+    lattice_x = np.arange(cell_x[-1] + 2, dtype=np.uint64) * np.uint64(scale)
+    lattice_y = np.arange(cell_y[-1] + 2, dtype=np.uint64) * np.uint64(scale)
+    lattice = _hash_unit_array(lattice_x[None, :], lattice_y[:, None], seed)
+    v00 = lattice[np.ix_(cell_y, cell_x)]
+    v10 = lattice[np.ix_(cell_y, cell_x + 1)]
+    v01 = lattice[np.ix_(cell_y + 1, cell_x)]
+    v11 = lattice[np.ix_(cell_y + 1, cell_x + 1)]
+    ix0 = lerp(v00, v10, u[None, :])
+    ix1 = lerp(v01, v11, u[None, :])
+    return lerp(ix0, ix1, v[:, None])
+
+
+def _fbm_noise_grid(width: int, height: int, seed: int, scales: List[int]):
+    total = np.zeros((height, width))
+    amplitude = 1.0
+    norm = 0.0
+    for scale in scales:
+        total += _value_noise_grid(width, height, seed, scale) * amplitude
+        norm += amplitude
+        amplitude *= 0.5
+    if norm == 0.0:
+        return total
+    return total / norm
+
+
+def _build_fields_numpy(
+    width: int, height: int, seed: int, scales: List[int]
+) -> Tuple[List[int], List[int], List[int]]:
+    if height > 1:
+        lat = np.abs((np.arange(height) / (height - 1)) * 2.0 - 1.0)
+        lat_warm = (1.0 - lat)[:, None]
+    else:
+        lat_warm = 1.0
+    height_val = np.clip(_fbm_noise_grid(width, height, seed + 101, scales), 0.0, 1.0)
+    temp_noise = _fbm_noise_grid(width, height, seed + 202, scales)
+    rain_noise = _fbm_noise_grid(width, height, seed + 303, scales)
+    temp_val = np.clip(0.6 * temp_noise + 0.4 * lat_warm - 0.2 * height_val, 0.0, 1.0)
+    rain_val = np.clip(0.7 * rain_noise + 0.3 * (1.0 - height_val), 0.0, 1.0)
+    return (
+        (height_val * 255.0).astype(np.int64).ravel().tolist(),
+        (temp_val * 255.0).astype(np.int64).ravel().tolist(),
+        (rain_val * 255.0).astype(np.int64).ravel().tolist(),
+    )
+
+
 def build_fields(width: int, height: int, seed: int) -> Tuple[List[int], List[int], List[int]]:
     scales = build_noise_scales(width, height)
+    if np is not None and width > 0 and height > 0:
+        return _build_fields_numpy(width, height, seed, scales)
     size = width * height
     heights = [0] * size
     temps = [0] * size
@@ -554,6 +1530,8 @@ def build_flow_fields(
     heights: List[int], base_rainfall: List[float], width: int, height: int
 ) -> Tuple[List[float], List[bool], List[float]]:
     size = width * height
+    if np is not None and size > 0:
+        return _build_flow_fields_numpy(heights, base_rainfall, width, height)
     flow_to = list(range(size))
     for y in range(height):
         row = y * width
@@ -573,22 +1551,29 @@ def build_flow_fields(
                     best_idx = nidx
             flow_to[idx] = best_idx
     accum = [base_rainfall[idx] + RIVER_FLOW_BASE for idx in range(size)]
-    order = sorted(range(size), key=lambda i: heights[i], reverse=True)
-    for idx in order:
-        dest = flow_to[idx]
-        if dest != idx:
-            accum[dest] += accum[idx]
+    # Heights are bytes, so bucketing by height gives the highest-first order
+    # (ties by index, like a stable sort) in linear time.
+    levels: List[List[int]] = [[] for _ in range(max(heights, default=0) + 1)]
+    for idx, cell_height in enumerate(heights):
+        levels[cell_height].append(idx)
+    for level in reversed(levels):
+        for idx in level:
+            dest = flow_to[idx]
+            if dest != idx:
+                accum[dest] += accum[idx]
     river_mask = [False for _ in range(size)]
     river_strength = [0.0 for _ in range(size)]
     land_indices = [idx for idx, height in enumerate(heights) if height >= WATER_LEVEL]
     if not land_indices:
         return accum, river_mask, river_strength
-    land_accum = sorted(accum[idx] for idx in land_indices)
-    cutoff_index = int(len(land_accum) * RIVER_PERCENTILE)
-    if cutoff_index >= len(land_accum):
-        cutoff_index = len(land_accum) - 1
-    cutoff = land_accum[cutoff_index]
-    max_accum = land_accum[-1]
+    cutoff_index = int(len(land_indices) * RIVER_PERCENTILE)
+    if cutoff_index >= len(land_indices):
+        cutoff_index = len(land_indices) - 1
+    # The cutoff is the (len - cutoff_index)-th largest land value; only that
+    # top slice needs ordering, not the whole list.
+    top = heapq.nlargest(len(land_indices) - cutoff_index, (accum[idx] for idx in land_indices))
+    cutoff = top[-1]
+    max_accum = top[0]
     if max_accum <= cutoff + 1e-6:
         return accum, river_mask, river_strength
     span = max_accum - cutoff
@@ -599,6 +1584,175 @@ def build_flow_fields(
     return accum, river_mask, river_strength
 
 
+def _build_flow_fields_numpy(
+    heights: List[int], base_rainfall: List[float], width: int, height: int
+) -> Tuple[List[float], List[bool], List[float]]:
+    size = width * height
+    grid = np.asarray(heights, dtype=np.int64).reshape(height, width)
+    index = np.arange(size).reshape(height, width)
+    flow_to = index.copy()
+    best = grid.copy()
+    # Same neighbour order and strict comparison as the scalar scan, so ties
+    # keep the first lower neighbour found.
+    for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+        src_y = slice(max(0, -dy), height - max(0, dy))
+        src_x = slice(max(0, -dx), width - max(0, dx))
+        dst_y = slice(max(0, dy), height - max(0, -dy))
+        dst_x = slice(max(0, dx), width - max(0, -dx))
+        lower = grid[dst_y, dst_x] < best[src_y, src_x]
+        best[src_y, src_x] = np.where(lower, grid[dst_y, dst_x], best[src_y, src_x])
+        flow_to[src_y, src_x] = np.where(lower, index[dst_y, dst_x], flow_to[src_y, src_x])
+    flat_heights = grid.ravel()
+    flow_to = flow_to.ravel()
+    accum = np.asarray(base_rainfall, dtype=np.float64) + RIVER_FLOW_BASE
+    # Water only flows strictly downhill, so one height level never feeds
+    # itself: process levels top-down, adding in index order within a level.
+    order = np.argsort(-flat_heights, kind="stable")
+    bounds = np.cumsum(np.bincount(flat_heights, minlength=256)[::-1])
+    start = 0
+    for end in bounds:
+        if end > start:
+            level = order[start:end]
+            level = level[flow_to[level] != level]
+            np.add.at(accum, flow_to[level], accum[level])
+            start = end
+    river_mask = np.zeros(size, dtype=bool)
+    river_strength = np.zeros(size)
+    land = flat_heights >= WATER_LEVEL
+    land_accum = accum[land]
+    if land_accum.size:
+        cutoff_index = min(int(land_accum.size * RIVER_PERCENTILE), land_accum.size - 1)
+        cutoff = np.partition(land_accum, cutoff_index)[cutoff_index]
+        max_accum = land_accum.max()
+        if max_accum > cutoff + 1e-6:
+            river_mask = land & (accum >= cutoff)
+            river_strength[river_mask] = np.clip((accum[river_mask] - cutoff) / (max_accum - cutoff), 0.0, 1.0)
+    return accum.tolist(), river_mask.tolist(), river_strength.tolist()
+
+
+WorldFields = Tuple[List[int], List[int], List[int], List[float], List[bool], List[float]]
+
+
+def generate_world(
+    seed: int,
+    width: int,
+    height: int,
+    rainfall_scale: float = 1.0,
+    fields: Optional[Tuple[List[int], List[int], List[int]]] = None,
+) -> WorldFields:
+    # fields: heights/temps/rains already built for this seed and size; only
+    # the flow fields depend on rainfall_scale.
+    heights, temps, rains = fields if fields is not None else build_fields(width, height, seed)
+    base_rainfall = [clamp_unit((rain / 255.0) * rainfall_scale) for rain in rains]
+    flow_accum, river_mask, river_strength = build_flow_fields(heights, base_rainfall, width, height)
+    return heights, temps, rains, flow_accum, river_mask, river_strength
+
+
+def _pack_f8(values) -> bytes:
+    # Little-endian float64 regardless of host byte order.
+    packed = array("d", values)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack_f8(data) -> List[float]:
+    unpacked = array("d")
+    unpacked.frombytes(data)
+    if sys.byteorder != "little":
+        unpacked.byteswap()
+    return unpacked.tolist()
+
+
+class WorldCache:
+    """Bounded LRU of generated worlds keyed by (seed, width, height, rainfall_scale).
+
+    Entries are shared between simulations and must be treated as read-only.
+    With cache_dir set, misses are also looked up in (and written to) a binary
+    file per key so repeated launches skip terrain generation. A miss whose
+    seed and size match a cached entry reuses its terrain and climate fields
+    and recomputes only the rainfall-dependent flow fields.
+    """
+
+    def __init__(self, max_entries: int = WORLD_CACHE_ENTRIES, cache_dir: Optional[str] = None) -> None:
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.entries: "OrderedDict[Tuple[int, int, int, float], WorldFields]" = OrderedDict()
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def get(self, seed: int, width: int, height: int, rainfall_scale: float = 1.0) -> WorldFields:
+        key = (seed, width, height, float(rainfall_scale))
+        world = self.entries.get(key)
+        if world is not None:
+            self.entries.move_to_end(key)
+            return world
+        world = self._load(key)
+        if world is None:
+            fields = None
+            for other_key, other in self.entries.items():
+                if other_key[:3] == key[:3]:
+                    fields = other[:3]
+                    break
+            world = generate_world(seed, width, height, rainfall_scale, fields)
+            self._store(key, world)
+        self.entries[key] = world
+        while len(self.entries) > max(0, self.max_entries):
+            self.entries.popitem(last=False)
+        return world
+
+    def _path(self, key: Tuple[int, int, int, float]) -> str:
+        digest = hashlib.sha256(repr((WORLD_CACHE_VERSION, key)).encode("ascii")).hexdigest()[:20]
+        return os.path.join(self.cache_dir or ".", f"microverse_world_{digest}.bin")
+
+    def _load(self, key: Tuple[int, int, int, float]) -> Optional[WorldFields]:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), "rb") as handle:
+                data = handle.read()
+        except OSError:
+            return None
+        key_text = repr(key).encode("ascii")
+        size = key[1] * key[2]
+        header = WORLD_CACHE_MAGIC + struct.pack("<II", WORLD_CACHE_VERSION, len(key_text)) + key_text
+        if not data.startswith(header) or len(data) != len(header) + size * 20:
+            return None
+        view = memoryview(data)[len(header) :]
+        heights = list(view[:size])
+        temps = list(view[size : 2 * size])
+        rains = list(view[2 * size : 3 * size])
+        river_mask = [bool(value) for value in view[3 * size : 4 * size]]
+        flow_accum = _unpack_f8(view[4 * size : 12 * size])
+        river_strength = _unpack_f8(view[12 * size :])
+        return heights, temps, rains, flow_accum, river_mask, river_strength
+
+    def _store(self, key: Tuple[int, int, int, float], world: WorldFields) -> None:
+        if not self.cache_dir:
+            return
+        heights, temps, rains, flow_accum, river_mask, river_strength = world
+        key_text = repr(key).encode("ascii")
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_path, "wb") as handle:
+                handle.write(WORLD_CACHE_MAGIC + struct.pack("<II", WORLD_CACHE_VERSION, len(key_text)) + key_text)
+                handle.write(bytes(heights))
+                handle.write(bytes(temps))
+                handle.write(bytes(rains))
+                handle.write(bytes(river_mask))
+                handle.write(_pack_f8(flow_accum))
+                handle.write(_pack_f8(river_strength))
+            os.replace(temp_path, path)
+        except OSError as exc:
+            print(f"WORLD CACHE: could not write {path} ({exc})")
+
+
+WORLD_CACHE = WorldCache()
+
+
 def normalize_vec3(x: float, y: float, z: float) -> Tuple[float, float, float]:
     length = math.sqrt(x * x + y * y + z * z)
     if length == 0.0:
@@ -689,6 +1843,18 @@ def sun_state(
     return sun_dir, sun_height, sky_color
 
 
+def light_terms(sun_height: float) -> Tuple[float, float, float, float, float]:
+    # (ambient, diffuse gain, sky tint, water reflect, specular gain) at a sun
+    # height; every shading path builds its arithmetic from these.
+    return (
+        LIGHT_AMBIENT + LIGHT_AMBIENT_SUN * sun_height,
+        LIGHT_DIFFUSE * (LIGHT_DIFFUSE_FLOOR + LIGHT_DIFFUSE_SUN * sun_height),
+        LIGHT_SKY_TINT + LIGHT_SKY_TINT_SUN * sun_height,
+        WATER_REFLECT + WATER_REFLECT_SUN * sun_height,
+        WATER_SPEC + WATER_SPEC_SUN * sun_height,
+    )
+
+
 def shade_color(
     base: Tuple[int, int, int],
     normal: Tuple[float, float, float],
@@ -699,28 +1865,69 @@ def shade_color(
 ) -> Tuple[int, int, int]:
     dot = normal[0] * sun_dir[0] + normal[1] * sun_dir[1] + normal[2] * sun_dir[2]
     dot = max(0.0, dot)
-    ambient = 0.22 + 0.35 * sun_height
-    diffuse = 0.6 * dot * (0.25 + 0.75 * sun_height)
-    light = ambient + diffuse
+    ambient, diffuse, sky_tint, reflect, spec_gain = light_terms(sun_height)
+    light = ambient + diffuse * dot
     r = base[0] * light
     g = base[1] * light
     b = base[2] * light
-    sky_tint = 0.08 + 0.12 * sun_height
     r = r * (1.0 - sky_tint) + sky_color[0] * sky_tint
     g = g * (1.0 - sky_tint) + sky_color[1] * sky_tint
     b = b * (1.0 - sky_tint) + sky_color[2] * sky_tint
     if is_water:
-        reflect = 0.2 + 0.35 * sun_height
         r = r * (1.0 - reflect) + sky_color[0] * reflect
         g = g * (1.0 - reflect) + sky_color[1] * reflect
         b = b * (1.0 - reflect) + sky_color[2] * reflect
-        spec = (dot ** 12) * (0.45 + 0.35 * sun_height)
+        spec = (dot ** WATER_SPEC_POWER) * spec_gain
         r += 255.0 * spec
         g += 255.0 * spec
         b += 255.0 * spec
     return (clamp_byte(r), clamp_byte(g), clamp_byte(b))
 
 
+def build_shading_arrays(
+    base_colors: List[Tuple[int, int, int]],
+    normals: List[Tuple[float, float, float]],
+    water_mask: List[bool],
+    width: int,
+    height: int,
+    heights: Optional[List[int]] = None,
+) -> Optional[Dict[str, object]]:
+    if np is None:
+        return None
+    shading = {
+        "base": np.array(base_colors, dtype=np.float64).reshape(height, width, 3),
+        "normals": np.array(normals, dtype=np.float64).reshape(height, width, 3),
+        "water": np.array(water_mask, dtype=bool).reshape(height, width),
+    }
+    if heights is not None:
+        shading["heights"] = np.array(heights, dtype=np.float64)
+    return shading
+
+
+def shade_array(
+    shading: Dict[str, object],
+    sun_dir: Tuple[float, float, float],
+    sun_height: float,
+    sky_color: Tuple[int, int, int],
+):
+    # shade_color over (..., 3) planes, term for term, returning uint8 RGB.
+    base = shading["base"]
+    normals = shading["normals"]
+    water = shading["water"]
+    dot = normals[..., 0] * sun_dir[0] + normals[..., 1] * sun_dir[1] + normals[..., 2] * sun_dir[2]
+    np.maximum(dot, 0.0, out=dot)
+    ambient, diffuse, sky_tint, reflect, spec_gain = light_terms(sun_height)
+    light = ambient + diffuse * dot
+    sky = np.array(sky_color, dtype=np.float64)
+    rgb = base * light[..., None]
+    rgb = rgb * (1.0 - sky_tint) + sky * sky_tint
+    if water.any():
+        spec = (dot[water] ** WATER_SPEC_POWER) * spec_gain
+        rgb[water] = rgb[water] * (1.0 - reflect) + sky * reflect + (255.0 * spec)[:, None]
+    np.clip(rgb, 0.0, 255.0, out=rgb)
+    return rgb.astype(np.uint8)
+
+
 def render_lit_surface(
     surface,
     base_colors: List[Tuple[int, int, int]],
@@ -731,7 +1938,16 @@ def render_lit_surface(
     sky_color: Tuple[int, int, int],
     width: int,
     height: int,
+    shading: Optional[Dict[str, object]] = None,
 ) -> None:
+    if np is not None:
+        import pygame.surfarray
+
+        if shading is None:
+            shading = build_shading_arrays(base_colors, normals, water_mask, width, height)
+        rgb = shade_array(shading, sun_dir, sun_height, sky_color)
+        pygame.surfarray.blit_array(surface, rgb.transpose(1, 0, 2))
+        return
     surface.lock()
     for y in range(height):
         row = y * width
@@ -749,6 +1965,152 @@ def render_lit_surface(
     surface.unlock()
 
 
+def quantize_sun_state(
+    sun_dir: Tuple[float, float, float],
+    sun_height: float,
+    sky_color: Tuple[int, int, int],
+    steps: int = LIGHTING_QUANT_STEPS,
+    sky_step: int = LIGHTING_SKY_STEP,
+) -> Tuple[tuple, Tuple[float, float, float], float, Tuple[int, int, int]]:
+    # Returns (key, sun_dir, sun_height, sky_color) snapped to the key's grid,
+    # so a cached shading depends only on its key, never on which frame made it.
+    dir_key = tuple(int(round(component * steps)) for component in sun_dir)
+    height_key = int(round(sun_height * steps))
+    sky_key = tuple(int(round(channel / sky_step)) for channel in sky_color)
+    key = (dir_key, height_key, sky_key)
+    snapped_dir = normalize_vec3(*(component / steps for component in dir_key))
+    snapped_sky = (
+        clamp_byte(sky_key[0] * sky_step),
+        clamp_byte(sky_key[1] * sky_step),
+        clamp_byte(sky_key[2] * sky_step),
+    )
+    return key, snapped_dir, clamp_unit(height_key / steps), snapped_sky
+
+
+class LightingCache:
+    """Small LRU of lit map surfaces keyed by quantize_sun_state keys.
+
+    Capacity comes from a byte budget, so small maps keep many recent sun states
+    while large maps keep only a few.
+    """
+
+    def __init__(self, width: int, height: int, max_bytes: int = LIGHTING_CACHE_BYTES) -> None:
+        self.max_entries = max(2, max_bytes // max(1, width * height * 4))
+        self.entries: "OrderedDict[tuple, object]" = OrderedDict()
+
+    def get(self, key: tuple):
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+        return surface
+
+    def put(self, key: tuple, surface) -> None:
+        self.entries[key] = surface
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+def _shade_terrain(base, normals, water, sun_dir, sun_height, sky_color):
+    # 3D-view colours as uint8 rows: shade_array followed by the water sky blend.
+    rgb = shade_array({"base": base, "normals": normals, "water": water}, sun_dir, sun_height, sky_color)
+    if not water.any():
+        return rgb
+    sky = np.array(sky_color, dtype=np.float64)
+    blended = rgb[water].astype(np.float64)
+    blended += (sky - blended) * (VIEW3D_WATER_REFLECT + VIEW3D_WATER_REFLECT_SUN * sun_height)
+    rgb[water] = np.clip(blended, 0.0, 255.0).astype(np.uint8)
+    return rgb
+
+
+def preshade_terrain(
+    planes: Dict[str, object],
+    sun_dir: Tuple[float, float, float],
+    sun_height: float,
+    sky_color: Tuple[int, int, int],
+):
+    # Lit colour of every cell in shading arrays or a terrain pyramid for one sun
+    # state, indexed like the planes' flattened cells.
+    return _shade_terrain(
+        planes["base"].reshape(-1, 3),
+        planes["normals"].reshape(-1, 3),
+        planes["water"].reshape(-1),
+        sun_dir,
+        sun_height,
+        sky_color,
+    )
+
+
+def fog_ramp_index(dist: float, fog_start: float, fog_span: float, steps: int = VIEW3D_FOG_STEPS) -> int:
+    if dist <= fog_start:
+        return 0
+    return int(round(clamp_unit((dist - fog_start) / fog_span) * (steps - 1)))
+
+
+def fog_ramp_table(sky_color: Tuple[int, int, int], steps: int = VIEW3D_FOG_STEPS):
+    # table[step, channel, value] == blend_color(..., sky_color, ramp[step]) per channel.
+    ramp = np.array([smoothstep(level / (steps - 1)) for level in range(steps)], dtype=np.float64)
+    values = np.arange(256, dtype=np.float64)
+    sky = np.array(sky_color, dtype=np.float64)
+    table = values[None, None, :] + (sky[None, :, None] - values[None, None, :]) * ramp[:, None, None]
+    np.clip(table, 0.0, 255.0, out=table)
+    return table.astype(np.uint8)
+
+
+def build_terrain_pyramid(
+    shading: Dict[str, object],
+    width: int,
+    height: int,
+    levels: int = VIEW3D_LOD_LEVELS,
+) -> Dict[str, object]:
+    # Mip levels of the 3D view's terrain planes, each a 2x2 box filter of the one
+    # below (odd edges repeat) with normals renormalized, packed into flat arrays
+    # with per-level offsets so one gather can read samples from mixed levels.
+    # Coarse cells count as water when at least half of their area is.
+    heights = shading["heights"].reshape(height, width)
+    base = shading["base"]
+    normals = shading["normals"]
+    water = shading["water"].astype(np.float64)
+    planes = {"heights": [], "base": [], "normals": [], "water": []}
+    offsets = []
+    widths = []
+    offset = 0
+    level_w = width
+    level_h = height
+    for level in range(levels):
+        if level:
+            if level_w < 2 and level_h < 2:
+                break
+            pad = ((0, level_h % 2), (0, level_w % 2))
+            level_w = (level_w + 1) // 2
+            level_h = (level_h + 1) // 2
+
+            def box(plane):
+                extra = ((0, 0),) * (plane.ndim - 2)
+                plane = np.pad(plane, pad + extra, mode="edge")
+                return plane.reshape(level_h, 2, level_w, 2, *plane.shape[2:]).mean(axis=(1, 3))
+
+            heights = box(heights)
+            base = box(base)
+            normals = box(normals)
+            # Averaged unit normals come out short, which would dim the diffuse
+            # term at each LOD switch; bring them back to unit length.
+            length = np.sqrt((normals * normals).sum(axis=-1, keepdims=True))
+            normals = np.where(length > 0.0, normals / np.maximum(length, 1e-12), (0.0, 0.0, 1.0))
+            water = box(water)
+        planes["heights"].append(heights.reshape(-1))
+        planes["base"].append(base.reshape(-1, 3))
+        planes["normals"].append(normals.reshape(-1, 3))
+        planes["water"].append(water.reshape(-1) >= 0.5)
+        offsets.append(offset)
+        widths.append((level_w, level_h))
+        offset += level_w * level_h
+    pyramid = {name: np.concatenate(chunks) for name, chunks in planes.items()}
+    pyramid["offsets"] = np.array(offsets, dtype=np.int64)
+    pyramid["sizes"] = np.array(widths, dtype=np.int64)
+    return pyramid
+
+
 def render_heightmap_3d(
     pygame,
     screen,
@@ -772,6 +2134,9 @@ def render_heightmap_3d(
     view_height: int,
     step: float,
     max_distance: float,
+    shading: Optional[Dict[str, object]] = None,
+    pyramid: Optional[Dict[str, object]] = None,
+    terrain_colors=None,
 ) -> None:
     render_width = view_rect.width
     render_height = view_rect.height
@@ -792,57 +2157,96 @@ def render_heightmap_3d(
     fog_start = max_distance * 0.2
     fog_end = max_distance * 0.85
     fog_span = max(1.0, fog_end - fog_start)
-    for col in range(render_width):
-        offset = (col / max(1, render_width - 1)) - 0.5
-        angle = yaw + offset * fov
-        dir_x = math.cos(angle)
-        dir_y = math.sin(angle)
-        y_buffer = view_rect.bottom - 1
+    if np is not None:
+        if shading is None:
+            shading = build_shading_arrays(base_colors, normals, water_mask, world_width, world_height)
+        _render_voxel_columns_numpy(
+            pygame,
+            screen,
+            view_rect,
+            heights,
+            shading,
+            sun_dir,
+            sun_height,
+            sky_color,
+            world_width,
+            world_height,
+            cam_x,
+            cam_y,
+            yaw,
+            fov,
+            height_scale,
+            camera_height,
+            proj_scale,
+            horizon,
+            step,
+            max_distance,
+            fog_start,
+            fog_span,
+            pyramid,
+            terrain_colors,
+        )
+    else:
+        # Every column walks the same distances, so the fog ramp is looked up once
+        # per step, and a cell seen by several columns is shaded once per frame.
+        fog_ramp = [smoothstep(level / (VIEW3D_FOG_STEPS - 1)) for level in range(VIEW3D_FOG_STEPS)]
+        water_reflect = VIEW3D_WATER_REFLECT + VIEW3D_WATER_REFLECT_SUN * sun_height
+        schedule = []
         dist = 1.0
-        while dist < max_distance and y_buffer > view_rect.top:
-            sample_x = cam_x + dir_x * dist
-            sample_y = cam_y + dir_y * dist
-            if sample_x < 0 or sample_x >= world_width or sample_y < 0 or sample_y >= world_height:
-                break
-            sx = int(sample_x)
-            sy = int(sample_y)
-            idx = sy * world_width + sx
-            height = (heights[idx] / 255.0) * height_scale
-            projected = horizon - (height - camera_height) * proj_scale / dist
-            if projected < view_rect.top:
-                projected = view_rect.top
-            if projected < y_buffer:
-                is_water = water_mask[idx]
-                color = shade_color(
-                    base_colors[idx],
-                    normals[idx],
-                    sun_dir,
-                    sun_height,
-                    sky_color,
-                    is_water,
-                )
-                if is_water:
-                    water_reflect = 0.12 + 0.25 * sun_height
-                    color = blend_color(color, sky_color, water_reflect)
-                if dist > fog_start:
-                    fog_t = clamp_unit((dist - fog_start) / fog_span)
-                    fog_t = smoothstep(fog_t)
-                    color = blend_color(color, sky_color, fog_t)
-                top = int(projected)
-                bottom = int(y_buffer)
-                if bottom > view_rect.bottom - 1:
-                    bottom = view_rect.bottom - 1
-                if top < view_rect.top:
-                    top = view_rect.top
-                if top <= bottom:
-                    pygame.draw.line(
-                        screen,
-                        color,
-                        (view_rect.left + col, top),
-                        (view_rect.left + col, bottom),
-                    )
-                y_buffer = projected
+        while dist < max_distance:
+            schedule.append((dist, fog_ramp[fog_ramp_index(dist, fog_start, fog_span)]))
             dist += step
+        lit: Dict[int, Tuple[int, int, int]] = {}
+        for col in range(render_width):
+            offset = (col / max(1, render_width - 1)) - 0.5
+            angle = yaw + offset * fov
+            dir_x = math.cos(angle)
+            dir_y = math.sin(angle)
+            y_buffer = view_rect.bottom - 1
+            for dist, fog_t in schedule:
+                if y_buffer <= view_rect.top:
+                    break
+                sample_x = cam_x + dir_x * dist
+                sample_y = cam_y + dir_y * dist
+                if sample_x < 0 or sample_x >= world_width or sample_y < 0 or sample_y >= world_height:
+                    break
+                sx = int(sample_x)
+                sy = int(sample_y)
+                idx = sy * world_width + sx
+                height = (heights[idx] / 255.0) * height_scale
+                projected = horizon - (height - camera_height) * proj_scale / dist
+                if projected < view_rect.top:
+                    projected = view_rect.top
+                if projected < y_buffer:
+                    color = lit.get(idx)
+                    if color is None:
+                        color = shade_color(
+                            base_colors[idx],
+                            normals[idx],
+                            sun_dir,
+                            sun_height,
+                            sky_color,
+                            water_mask[idx],
+                        )
+                        if water_mask[idx]:
+                            color = blend_color(color, sky_color, water_reflect)
+                        lit[idx] = color
+                    if fog_t:
+                        color = blend_color(color, sky_color, fog_t)
+                    top = int(projected)
+                    bottom = int(y_buffer)
+                    if bottom > view_rect.bottom - 1:
+                        bottom = view_rect.bottom - 1
+                    if top < view_rect.top:
+                        top = view_rect.top
+                    if top <= bottom:
+                        pygame.draw.line(
+                            screen,
+                            color,
+                            (view_rect.left + col, top),
+                            (view_rect.left + col, bottom),
+                        )
+                    y_buffer = projected
     horizon_line = int(round(horizon))
     if view_rect.top <= horizon_line <= view_rect.bottom - 1:
         horizon_color = blend_color(sky_color, (20, 20, 30), 0.25)
@@ -854,13 +2258,236 @@ def render_heightmap_3d(
         )
 
 
+def _render_voxel_columns_numpy(
+    pygame,
+    screen,
+    view_rect,
+    heights: List[int],
+    shading: Dict[str, object],
+    sun_dir: Tuple[float, float, float],
+    sun_height: float,
+    sky_color: Tuple[int, int, int],
+    world_width: int,
+    world_height: int,
+    cam_x: float,
+    cam_y: float,
+    yaw: float,
+    fov: float,
+    height_scale: float,
+    camera_height: float,
+    proj_scale: float,
+    horizon: float,
+    step: float,
+    max_distance: float,
+    fog_start: float,
+    fog_span: float,
+    pyramid: Optional[Dict[str, object]] = None,
+    terrain_colors=None,
+) -> None:
+    # The column loop of render_heightmap_3d with every column stepped at once:
+    # rows are distance slices, columns are screen columns. A column's y-buffer
+    # before a slice is the running minimum of the spans drawn so far, so it is a
+    # cumulative min instead of loop state, and each pixel is owned by the last
+    # span that covers it. Pixels land in one buffer that is blitted back once.
+    # With a terrain pyramid, each doubling of distance past VIEW3D_LOD_DISTANCE
+    # samples one mip level coarser and doubles the step. terrain_colors, from
+    # preshade_terrain over the same planes, turns shading into a gather, and fog
+    # is a (ramp step, channel, value) table lookup.
+    import pygame.surfarray
+
+    render_width = view_rect.width
+    view_top = view_rect.top
+    view_bottom = view_rect.bottom - 1
+    dists = []
+    slice_levels = []
+    level = 0
+    top_level = 0 if pyramid is None else len(pyramid["offsets"]) - 1
+    dist = 1.0
+    while dist < max_distance:
+        while level < top_level and dist >= VIEW3D_LOD_DISTANCE * (1 << level):
+            level += 1
+        dists.append(dist)
+        slice_levels.append(level)
+        dist += step * (1 << level)
+    if not dists:
+        return
+    dirs_x = []
+    dirs_y = []
+    for col in range(render_width):
+        angle = yaw + ((col / max(1, render_width - 1)) - 0.5) * fov
+        dirs_x.append(math.cos(angle))
+        dirs_y.append(math.sin(angle))
+    dist_col = np.array(dists, dtype=np.float64)[:, None]
+    sample_x = cam_x + np.array(dirs_x, dtype=np.float64)[None, :] * dist_col
+    sample_y = cam_y + np.array(dirs_y, dtype=np.float64)[None, :] * dist_col
+    inside = (sample_x >= 0) & (sample_x < world_width) & (sample_y >= 0) & (sample_y < world_height)
+    inside = np.logical_and.accumulate(inside, axis=0)
+    cell_x = np.clip(sample_x, 0, world_width - 1).astype(np.int64)
+    cell_y = np.clip(sample_y, 0, world_height - 1).astype(np.int64)
+    if pyramid is None:
+        cells = cell_y * world_width + cell_x
+        height_plane = shading.get("heights")
+        if height_plane is None:
+            height_plane = np.array(heights, dtype=np.float64)
+        planes = shading
+    else:
+        lod = np.array(slice_levels, dtype=np.int64)[:, None]
+        level_w = pyramid["sizes"][lod, 0]
+        cells = pyramid["offsets"][lod] + (cell_y >> lod) * level_w + (cell_x >> lod)
+        height_plane = pyramid["heights"]
+        planes = pyramid
+    sample_h = (height_plane[cells] / 255.0) * height_scale
+    projected = horizon - (sample_h - camera_height) * proj_scale / dist_col
+    np.maximum(projected, view_top, out=projected)
+    projected[~inside] = np.inf
+    y_buffer = np.empty_like(projected)
+    y_buffer[0] = view_bottom
+    np.minimum.accumulate(projected[:-1], axis=0, out=y_buffer[1:])
+    np.minimum(y_buffer, view_bottom, out=y_buffer)
+    visible = inside & (y_buffer > view_top) & (projected < y_buffer)
+    cols, slices = np.nonzero(visible.T)
+    if cols.size == 0:
+        return
+    span_top = projected[slices, cols].astype(np.int64)
+    span_bottom = np.minimum(y_buffer[slices, cols].astype(np.int64), view_bottom)
+    later = np.zeros(cols.size, dtype=bool)
+    later[:-1] = cols[:-1] == cols[1:]
+    lengths = span_bottom - (span_top + later) + 1
+    np.maximum(lengths, 0, out=lengths)
+
+    cell = cells[slices, cols]
+    if terrain_colors is None:
+        rgb = _shade_terrain(
+            planes["base"].reshape(-1, 3)[cell],
+            planes["normals"].reshape(-1, 3)[cell],
+            planes["water"].reshape(-1)[cell],
+            sun_dir,
+            sun_height,
+            sky_color,
+        )
+    else:
+        rgb = terrain_colors[cell]
+    fog_index = np.array([fog_ramp_index(dist, fog_start, fog_span) for dist in dists], dtype=np.int64)
+    rgb = fog_ramp_table(sky_color)[fog_index[slices][:, None], np.arange(3)[None, :], rgb]
+
+    owner = np.repeat(np.arange(cols.size), lengths)
+    starts = np.cumsum(lengths) - lengths
+    rows = np.repeat(span_bottom, lengths) - (np.arange(owner.size) - np.repeat(starts, lengths))
+    pixel_x = view_rect.left + cols[owner]
+    area = view_rect.clip(screen.get_rect())
+    if area.width <= 0 or area.height <= 0:
+        return
+    keep = (pixel_x >= area.left) & (pixel_x < area.right) & (rows >= area.top) & (rows < area.bottom)
+    target = screen.subsurface(area)
+    pixels = pygame.surfarray.array3d(target)
+    pixels[pixel_x[keep] - area.left, rows[keep] - area.top] = rgb[owner[keep]]
+    pygame.surfarray.blit_array(target, pixels)
+
+
+class LightingBasis:
+    """Per-cell lighting planes for constant-time relighting in integer fixed point.
+
+    shade_color is linear in the base color once the clamped normal.sun dot is
+    known: out = base * F(dot) + G(dot), with separate land and water F/G that
+    hold the ambient, diffuse, sky-tint, reflect and specular terms. Each cell
+    keeps its base color and a Q14 normal; relight() builds F/G tables over
+    LIGHT_DOT_BITS dot levels for the sun state, then does one dot product and
+    a multiply-add per channel. Dot quantization keeps every channel within
+    one level of shade_color.
+    """
+
+    def __init__(
+        self,
+        base_colors: List[Tuple[int, int, int]],
+        normals: List[Tuple[float, float, float]],
+        water_mask: List[bool],
+    ) -> None:
+        one = 1 << LIGHT_NORMAL_BITS
+        levels = (1 << LIGHT_DOT_BITS) + 1
+        self.size = len(base_colors)
+        normal_q = [tuple(int(round(component * one)) for component in normal) for normal in normals]
+        lut_offsets = [levels if water else 0 for water in water_mask]
+        if np is not None:
+            self.base = np.array(base_colors, dtype=np.int32).reshape(-1, 3)
+            self.normals = np.array(normal_q, dtype=np.int32).reshape(-1, 3)
+            self.lut_offset = np.array(lut_offsets, dtype=np.int32)
+        else:
+            self.base = base_colors
+            self.normals = normal_q
+            self.lut_offset = lut_offsets
+
+    def _tables(
+        self, sun_height: float, sky_color: Tuple[int, int, int]
+    ) -> Tuple[List[int], List[Tuple[int, int, int]]]:
+        levels = (1 << LIGHT_DOT_BITS) + 1
+        scale = float(1 << LIGHT_FRAC_BITS)
+        ambient, diffuse, sky_tint, reflect, spec_gain = light_terms(sun_height)
+        land_add = tuple(int(channel * sky_tint * scale) for channel in sky_color)
+        factors: List[int] = []
+        offsets: List[Tuple[int, int, int]] = []
+        for level in range(levels):
+            dot = level / (levels - 1)
+            factors.append(int((ambient + diffuse * dot) * (1.0 - sky_tint) * scale))
+            offsets.append(land_add)
+        for level in range(levels):
+            dot = level / (levels - 1)
+            factors.append(int((ambient + diffuse * dot) * (1.0 - sky_tint) * (1.0 - reflect) * scale))
+            spec = 255.0 * (dot ** WATER_SPEC_POWER) * spec_gain
+            offsets.append(
+                tuple(
+                    int((channel * sky_tint * (1.0 - reflect) + channel * reflect + spec) * scale)
+                    for channel in sky_color
+                )
+            )
+        return factors, offsets
+
+    def relight(
+        self,
+        sun_dir: Tuple[float, float, float],
+        sun_height: float,
+        sky_color: Tuple[int, int, int],
+    ) -> bytes:
+        # Row-major RGB bytes for the whole map.
+        one = 1 << LIGHT_NORMAL_BITS
+        sx, sy, sz = (int(round(component * one)) for component in sun_dir)
+        shift = 2 * LIGHT_NORMAL_BITS - LIGHT_DOT_BITS
+        top = 1 << LIGHT_DOT_BITS
+        frac = LIGHT_FRAC_BITS
+        factors, offsets = self._tables(sun_height, sky_color)
+        if np is not None:
+            normals = self.normals
+            dots = (normals[:, 0] * sx + normals[:, 1] * sy + normals[:, 2] * sz) >> shift
+            np.clip(dots, 0, top, out=dots)
+            lut = dots + self.lut_offset
+            rgb = self.base * np.array(factors, dtype=np.int32)[lut][:, None]
+            rgb += np.array(offsets, dtype=np.int32)[lut]
+            rgb >>= frac
+            np.clip(rgb, 0, 255, out=rgb)
+            return rgb.astype(np.uint8).tobytes()
+        out = bytearray(self.size * 3)
+        for idx, ((nx, ny, nz), (r, g, b)) in enumerate(zip(self.normals, self.base)):
+            dot = (nx * sx + ny * sy + nz * sz) >> shift
+            if dot < 0:
+                dot = 0
+            elif dot > top:
+                dot = top
+            lut = dot + self.lut_offset[idx]
+            factor = factors[lut]
+            add_r, add_g, add_b = offsets[lut]
+            pos = idx * 3
+            out[pos] = min(255, max(0, (r * factor + add_r) >> frac))
+            out[pos + 1] = min(255, max(0, (g * factor + add_g) >> frac))
+            out[pos + 2] = min(255, max(0, (b * factor + add_b) >> frac))
+        return bytes(out)
+
+
 def build_world_data(
     sim: Simulation,
-) -> Tuple[List[Tuple[int, int, int]], List[bool], List[Tuple[float, float, float]]]:
-    heights, temps, rains = build_fields(sim.width, sim.height, sim.seed)
-    base_rainfall = [rain / 255.0 for rain in rains]
-    _, river_mask, river_strength = build_flow_fields(
-        heights, base_rainfall, sim.width, sim.height
+) -> Tuple[List[Tuple[int, int, int]], List[bool], List[Tuple[float, float, float]], LightingBasis]:
+    # The renderer tints rivers from unscaled rainfall, i.e. the scale 1.0 world,
+    # which is the simulation's own cache entry for default runs.
+    heights, temps, rains, _, river_mask, river_strength = WORLD_CACHE.get(
+        sim.seed, sim.width, sim.height, 1.0
     )
     base_colors: List[Tuple[int, int, int]] = []
     water_mask: List[bool] = []
@@ -872,13 +2499,13 @@ def build_world_data(
         base_colors.append(color)
         water_mask.append(height < WATER_LEVEL or river_mask[idx])
     normals = build_normals(heights, sim.width, sim.height)
-    return base_colors, water_mask, normals
+    return base_colors, water_mask, normals, LightingBasis(base_colors, normals, water_mask)
 
 
 def build_world_surface(sim: Simulation):
     import pygame
 
-    base_colors, water_mask, normals = build_world_data(sim)
+    base_colors, water_mask, normals, basis = build_world_data(sim)
     surface = pygame.Surface((sim.width, sim.height))
     sun_dir, sun_height, sky_color = sun_state(0.0, 0.0)
     render_lit_surface(
@@ -892,7 +2519,7 @@ def build_world_surface(sim: Simulation):
         sim.width,
         sim.height,
     )
-    return surface, base_colors, water_mask, normals
+    return surface, base_colors, water_mask, normals, basis
 
 
 def viewport_dim(world_dim: int) -> int:
@@ -902,14 +2529,93 @@ def viewport_dim(world_dim: int) -> int:
     return min(world_dim, target)
 
 
-def update_history(history: List[float], value: float, max_len: int) -> None:
-    history.append(value)
-    if len(history) > max_len:
-        del history[: len(history) - max_len]
+class RingHistory:
+    """Fixed-capacity float history with O(1) append and sliding-window stats.
+
+    Samples live in a circular array('d'). Running sums are kept for each of
+    sum_windows, and monotonic deques of (index, value) give the maximum over
+    each of max_windows and over the whole retained history. Sums are re-added
+    from scratch once per window length so rounding drift stays bounded.
+    Indexing, slicing and iteration run oldest to newest like the list it replaces.
+    """
+
+    def __init__(self, capacity: int, sum_windows=(), max_windows=()) -> None:
+        self.capacity = max(1, capacity)
+        self.values = array("d", bytes(8 * self.capacity))
+        self.count = 0
+        self.sums: Dict[int, List[float]] = {
+            window: [0.0, 0] for window in sum_windows if 0 < window <= self.capacity
+        }
+        self.maxima: Dict[int, deque] = {
+            window: deque() for window in max_windows if 0 < window <= self.capacity
+        }
+        self.maxima.setdefault(self.capacity, deque())
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def __iter__(self):
+        values = self.values
+        for index in range(self.count - len(self), self.count):
+            yield values[index % self.capacity]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(self)[key]
+        size = len(self)
+        if key < 0:
+            key += size
+        if not 0 <= key < size:
+            raise IndexError("history index out of range")
+        return self.values[(self.count - size + key) % self.capacity]
+
+    def append(self, value: float) -> None:
+        index = self.count
+        capacity = self.capacity
+        values = self.values
+        for window, state in self.sums.items():
+            if index >= window:
+                state[0] -= values[(index - window) % capacity]
+            state[0] += value
+        values[index % capacity] = value
+        for window, state in self.sums.items():
+            state[1] += 1
+            if state[1] >= window:
+                start = max(0, index + 1 - window)
+                state[0] = sum(values[i % capacity] for i in range(start, index + 1))
+                state[1] = 0
+        for window, queue in self.maxima.items():
+            while queue and queue[-1][1] <= value:
+                queue.pop()
+            queue.append((index, value))
+            if queue[0][0] <= index - window:
+                queue.popleft()
+        self.count = index + 1
+
+    def window_sum(self, window: int) -> float:
+        # Sum of the newest `window` samples (fewer if the history is shorter).
+        window = min(window, len(self))
+        state = self.sums.get(window)
+        if state is None:
+            return sum(self[len(self) - window :]) if window else 0.0
+        return state[0]
+
+    def window_max(self, window: Optional[int] = None) -> float:
+        # Largest of the newest `window` samples; None means the whole history.
+        if window is None or window >= len(self):
+            window = self.capacity
+        queue = self.maxima.get(window)
+        if queue is None:
+            return max(self[-window:])
+        return queue[0][1] if queue else 0.0
+
+
+def new_history(capacity: int, crash_window: int, regime_window: int) -> RingHistory:
+    return RingHistory(capacity, sum_windows=(regime_window, 2 * regime_window), max_windows=(crash_window,))
 
 
 def mean(values: List[float]) -> float:
-    if not values:
+    if len(values) == 0:
         return 0.0
     return sum(values) / len(values)
 
@@ -1086,7 +2792,15 @@ class AviWriter:
     def add_frame(self, pygame, surface) -> None:
         if surface.get_width() != self.width or surface.get_height() != self.height:
             raise ValueError("Video frame size changed during capture.")
-        raw = pygame.image.tostring(surface, "BGR")
+        try:
+            raw = pygame.image.tostring(surface, "BGR")
+        except ValueError:
+            # pygame releases without the "BGR" format: swap red and blue ourselves.
+            rgb = pygame.image.tostring(surface, "RGB")
+            swapped = bytearray(rgb)
+            swapped[0::3] = rgb[2::3]
+            swapped[2::3] = rgb[0::3]
+            raw = bytes(swapped)
         frame_data = _pack_avi_frame(raw, self.width, self.height)
         if len(frame_data) != self.frame_size:
             raise ValueError("Video frame size mismatch.")
@@ -1281,9 +2995,9 @@ def write_html_report(report_snapshot: Dict[str, object], output_path: str) -> N
 
 
 def detect_event_details(
-    plant_history: List[float],
-    herb_history: List[float],
-    pred_history: List[float],
+    plant_history: RingHistory,
+    herb_history: RingHistory,
+    pred_history: RingHistory,
     crash_window: int,
     regime_window: int,
 ) -> Dict[str, Tuple[str, Optional[float]]]:
@@ -1291,30 +3005,29 @@ def detect_event_details(
     herb_count = int(round(herb_history[-1])) if herb_history else 0
     pred_count = int(round(pred_history[-1])) if pred_history else 0
     extinction_labels = []
-    if herb_history and herb_count == 0 and max(herb_history) > 0.0:
+    if herb_history and herb_count == 0 and herb_history.window_max() > 0.0:
         extinction_labels.append("Herbivores")
-    if pred_history and pred_count == 0 and max(pred_history) > 0.0:
+    if pred_history and pred_count == 0 and pred_history.window_max() > 0.0:
         extinction_labels.append("Predators")
     if extinction_labels:
         detail = ", ".join(extinction_labels)
         events["Extinction"] = (detail, None)
     crash_labels = []
     if crash_window >= 2 and len(herb_history) >= crash_window:
-        window = herb_history[-crash_window:]
-        peak = max(window)
+        peak = herb_history.window_max(crash_window)
         if peak > 0.0 and herb_history[-1] <= peak * (1.0 - CRASH_DROP):
             crash_labels.append("Herbivores")
     if crash_window >= 2 and len(pred_history) >= crash_window:
-        window = pred_history[-crash_window:]
-        peak = max(window)
+        peak = pred_history.window_max(crash_window)
         if peak > 0.0 and pred_history[-1] <= peak * (1.0 - CRASH_DROP):
             crash_labels.append("Predators")
     if crash_labels:
         detail = ", ".join(crash_labels)
         events["Crash"] = (detail, None)
     if len(plant_history) >= regime_window * 2:
-        recent = mean(plant_history[-regime_window:])
-        prior = mean(plant_history[-2 * regime_window : -regime_window])
+        recent_sum = plant_history.window_sum(regime_window)
+        recent = recent_sum / regime_window
+        prior = (plant_history.window_sum(2 * regime_window) - recent_sum) / regime_window
         delta = recent - prior
         if abs(delta) >= REGIME_SHIFT_DELTA:
             trend = "Up" if delta > 0.0 else "Down"
@@ -1323,10 +3036,16 @@ def detect_event_details(
     return events
 
 
-def format_counterfactual_result(persists: bool) -> str:
+def format_counterfactual_result(persists: Optional[bool], dropped: bool = False) -> str:
+    # None means the re-simulation is still running; dropped means it was
+    # cancelled or failed and no result will come.
     delta = COUNTERFACTUAL_RAINFALL_SCALE - 1.0
     percent = abs(int(round(delta * 100.0)))
     direction = "lower" if delta < 0.0 else "higher"
+    if dropped:
+        return f"Counterfactual ({percent}% {direction} rainfall): not run."
+    if persists is None:
+        return f"Counterfactual ({percent}% {direction} rainfall): pending\u2026"
     outcome = "persists" if persists else "clears"
     return f"Counterfactual ({percent}% {direction} rainfall): {outcome}."
 
@@ -1339,26 +3058,52 @@ def run_counterfactual(
     dt: float,
     target_label: str,
     target_detail: str,
+    agent_mode: str = "sequential",
+    rng_mode: str = "lcg",
+    checkpoint: Optional[bytes] = None,
+    histories: Optional[Tuple[List[float], List[float], List[float]]] = None,
+    rainfall_scale: float = COUNTERFACTUAL_RAINFALL_SCALE,
+    temp_offset: float = 0.0,
+    rain_multiplier: float = 1.0,
+    gravity: float = 1.0,
 ) -> bool:
+    # With a checkpoint (and the factual histories at that point) the changed
+    # world branches from it instead of replaying from tick 0. The run stops as
+    # soon as the event repeats, or once it can no longer repeat within `steps`.
     if steps <= 0:
         return False
     dt = max(1e-4, dt)
-    sim = Simulation(width=width, height=height, seed=seed, rainfall_scale=COUNTERFACTUAL_RAINFALL_SCALE)
+    sim = Simulation(
+        width=width,
+        height=height,
+        seed=seed,
+        rainfall_scale=rainfall_scale,
+        agent_mode=agent_mode,
+        rng_mode=rng_mode,
+    )
     history_len = 300
-    plant_history: List[float] = []
-    herb_history: List[float] = []
-    pred_history: List[float] = []
     crash_window = min(CRASH_WINDOW, history_len)
     regime_window = min(REGIME_WINDOW, max(1, history_len // 2))
+    plant_history = new_history(history_len, crash_window, regime_window)
+    herb_history = new_history(history_len, crash_window, regime_window)
+    pred_history = new_history(history_len, crash_window, regime_window)
     target_key = event_key(target_label, target_detail)
+    species_histories = {"Herbivores": herb_history, "Predators": pred_history}
+    target_histories = []
+    if target_label != "Regime shift":
+        target_histories = [species_histories.get(name) for name in target_detail.split(", ")]
+    if checkpoint is not None:
+        sim.restore(checkpoint)
+    if histories is not None:
+        for history, values in zip((plant_history, herb_history, pred_history), histories):
+            for value in values:
+                history.append(value)
 
     def sample_and_check() -> bool:
-        plant_mean = 0.0
-        if sim.plant_biomass:
-            plant_mean = sum(sim.plant_biomass) / len(sim.plant_biomass)
-        update_history(plant_history, plant_mean, history_len)
-        update_history(herb_history, float(len(sim.herbivore_x)), history_len)
-        update_history(pred_history, float(len(sim.predator_x)), history_len)
+        stats = sim.stats()
+        plant_history.append(stats["plant_mean"])
+        herb_history.append(float(stats["herbivores"]))
+        pred_history.append(float(stats["predators"]))
         events = detect_event_details(
             plant_history,
             herb_history,
@@ -1371,15 +3116,283 @@ def run_counterfactual(
                 return True
         return False
 
-    if sample_and_check():
+    def shift_ruled_out(remaining: int) -> bool:
+        # Each step moves the detector's recent-minus-prior sum by
+        # new - 2 * middle + old sample. Mean biomass rises by at most
+        # PLANT_GROWTH_RATE * dt per step (light and moisture are at most 1;
+        # grazing and decay only lower it), so bounding unseen samples by that
+        # ramp and by 0 bounds the upward delta within the steps left. Grazing
+        # puts no useful bound on a fall, so a downward shift is never ruled out.
+        window = regime_window
+        if target_key[1] != "Up" or len(plant_history) < 2 * window:
+            return False
+        bound = 2.0 * plant_history.window_sum(window) - plant_history.window_sum(2 * window)
+        last = plant_history[-1]
+        growth = PLANT_GROWTH_RATE * dt
+        limit = REGIME_SHIFT_DELTA * window - 1e-9
+        for ahead in range(1, remaining + 1):
+            bound += min(1.0, last + ahead * growth)
+            middle = ahead - window - 1
+            if middle < 0:
+                bound -= 2.0 * plant_history[middle]
+            old = middle - window
+            bound += plant_history[old] if old < 0 else min(1.0, last + (old + 1) * growth)
+            if bound >= limit:
+                return False
+        return True
+
+    def ruled_out(remaining: int) -> bool:
+        # Agents are only born to living parents, so once every species the
+        # event names has been at zero for a whole history it cannot crash or
+        # go extinct again.
+        if target_label == "Regime shift":
+            return shift_ruled_out(remaining)
+        if not target_histories:
+            return False
+        for history in target_histories:
+            if history is None or len(history) < history_len or history.window_max() > 0.0:
+                return False
+        return True
+
+    if histories is None and sample_and_check():
         return True
-    for _ in range(steps):
-        sim.step(dt)
+    for step in range(steps):
+        sim.step(dt, temp_offset=temp_offset, rain_multiplier=rain_multiplier, gravity=gravity)
         if sample_and_check():
             return True
+        if ruled_out(steps - step - 1):
+            return False
     return False
 
 
+class CounterfactualQueue:
+    """run_counterfactual jobs on a background process pool.
+
+    Jobs are keyed by the caller, which must put everything that changes the
+    outcome (event, branch checkpoint, laws) in the key. submit() returns a
+    finished result straight from the cache, or None while the job is queued or
+    running; duplicate keys share one job. Past max_pending queued jobs the
+    oldest is cancelled. poll() moves finished jobs into the cache and returns
+    their keys along with the keys of jobs that were cancelled or failed. If no
+    pool can be started, jobs run inline. Workers share the parent's
+    WORLD_CACHE directory.
+    """
+
+    def __init__(self, workers: int = COUNTERFACTUAL_WORKERS, max_pending: int = COUNTERFACTUAL_QUEUE) -> None:
+        self.workers = workers
+        self.max_pending = max(1, max_pending)
+        self.cache: Dict[tuple, bool] = {}
+        self.pending: "OrderedDict[tuple, object]" = OrderedDict()
+        self.dropped: List[tuple] = []
+        self.executor = None
+
+    def submit(self, key: tuple, *args, **kwargs) -> Optional[bool]:
+        if key in self.cache:
+            return self.cache[key]
+        if key in self.pending:
+            return None
+        executor = self._executor()
+        if executor is not None:
+            try:
+                self.pending[key] = executor.submit(run_counterfactual, *args, **kwargs)
+            except RuntimeError as exc:
+                # BrokenProcessPool, or a pool already shut down.
+                print(f"COUNTERFACTUAL: worker pool failed ({exc}); running inline")
+                self.shutdown()
+                self.workers = 0
+                executor = None
+        if executor is None:
+            self.cache[key] = run_counterfactual(*args, **kwargs)
+            return self.cache[key]
+        while len(self.pending) > self.max_pending:
+            self.cancel(next(iter(self.pending)))
+        return None
+
+    def cancel(self, key: tuple) -> None:
+        # A job that already started runs to completion, but its result is dropped.
+        future = self.pending.pop(key, None)
+        if future is not None:
+            future.cancel()
+            self.dropped.append(key)
+
+    def poll(self) -> Tuple[List[tuple], List[tuple]]:
+        finished = []
+        dropped, self.dropped = self.dropped, []
+        for key, future in list(self.pending.items()):
+            if not future.done():
+                continue
+            del self.pending[key]
+            if future.cancelled():
+                dropped.append(key)
+                continue
+            try:
+                self.cache[key] = future.result()
+            except Exception as exc:
+                print(f"COUNTERFACTUAL: job {key} failed ({exc})")
+                dropped.append(key)
+                continue
+            finished.append(key)
+        return finished, dropped
+
+    def shutdown(self) -> None:
+        for key in list(self.pending):
+            self.cancel(key)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def _executor(self):
+        if self.executor is None and self.workers > 0:
+            try:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+
+                # spawn keeps workers clear of the parent's SDL/window state.
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_install_worlds,
+                    initargs=({}, WORLD_CACHE.cache_dir),
+                )
+            except (ImportError, OSError, ValueError) as exc:
+                print(f"COUNTERFACTUAL: worker pool unavailable ({exc}); running inline")
+                self.workers = 0
+        return self.executor
+
+
+def _install_worlds(
+    worlds: Dict[Tuple[int, int, int, float], WorldFields], cache_dir: Optional[str] = None
+) -> None:
+    # Counterfactual worker initializer: point this process's WORLD_CACHE at the
+    # parent's cache directory and seed it with worlds the parent already
+    # generated, so runs do not rebuild terrain.
+    WORLD_CACHE.cache_dir = cache_dir
+    WORLD_CACHE.max_entries = max(WORLD_CACHE.max_entries, len(worlds))
+    WORLD_CACHE.entries.update(worlds)
+
+
+def sweep_counterfactuals(
+    seed: int,
+    width: int,
+    height: int,
+    steps: int,
+    dt: float,
+    target_label: str,
+    target_detail: str,
+    grid: Optional[Dict[str, Tuple[float, ...]]] = None,
+    base: Optional[Dict[str, float]] = None,
+    agent_mode: str = "sequential",
+    rng_mode: str = "lcg",
+    checkpoint: Optional[bytes] = None,
+    histories: Optional[Tuple[List[float], List[float], List[float]]] = None,
+    workers: Optional[int] = None,
+) -> Dict[str, List[Tuple[float, bool]]]:
+    """Run run_counterfactual once per grid value, varying one parameter at a time.
+
+    grid maps names from SWEEP_PARAMETERS to the values to try; every other
+    parameter stays at base (the factual settings, SWEEP_BASE by default).
+    Worlds for each distinct rainfall scale are generated once here and handed
+    to the workers. Runs go to a process pool of `workers` (all cores when
+    None) and run inline when workers is 0 or no pool can be started. Each run
+    stops once the event repeats or is ruled out: extinctions and crashes once
+    the named species stay at zero, upward regime shifts once plant growth can
+    no longer reach the threshold in the steps left; downward shifts always run
+    the full length. Returns (value, persists) pairs per parameter in grid order.
+    """
+    base = dict(SWEEP_BASE, **(base or {}))
+    grid = SWEEP_GRID if grid is None else grid
+    unknown = sorted(set(grid) - set(SWEEP_PARAMETERS))
+    if unknown:
+        raise ValueError(f"Unknown sweep parameter(s) {', '.join(unknown)}; expected {', '.join(SWEEP_PARAMETERS)}.")
+    runs = []
+    for name in SWEEP_PARAMETERS:
+        for value in grid.get(name, ()):
+            params = dict(base)
+            params[name] = float(value)
+            runs.append((name, float(value), params))
+    worlds = {}
+    for scale in sorted({params["rainfall_scale"] for _, _, params in runs}):
+        worlds[(seed, width, height, scale)] = WORLD_CACHE.get(seed, width, height, scale)
+    args = (seed, width, height, steps, dt, target_label, target_detail)
+    options = {"agent_mode": agent_mode, "rng_mode": rng_mode, "checkpoint": checkpoint, "histories": histories}
+    outcomes: Dict[Tuple[str, float], bool] = {}
+    executor = None
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 0 and len(runs) > 1:
+        try:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            executor = ProcessPoolExecutor(
+                max_workers=min(workers, len(runs)),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_install_worlds,
+                initargs=(worlds, WORLD_CACHE.cache_dir),
+            )
+        except (ImportError, OSError, ValueError) as exc:
+            print(f"SWEEP: worker pool unavailable ({exc}); running inline")
+    if executor is not None:
+        try:
+            with executor:
+                futures = {
+                    executor.submit(run_counterfactual, *args, **options, **params): (name, value)
+                    for name, value, params in runs
+                }
+                for future, run in futures.items():
+                    outcomes[run] = future.result()
+        except RuntimeError as exc:
+            # BrokenProcessPool: finish whatever is left inline.
+            print(f"SWEEP: worker pool failed ({exc}); running inline")
+    for name, value, params in runs:
+        if (name, value) not in outcomes:
+            outcomes[(name, value)] = run_counterfactual(*args, **options, **params)
+    results: Dict[str, List[Tuple[float, bool]]] = {}
+    for name, value, _params in runs:
+        results.setdefault(name, []).append((value, outcomes[(name, value)]))
+    return results
+
+
+def sweep_thresholds(
+    results: Dict[str, List[Tuple[float, bool]]], base: Optional[Dict[str, float]] = None
+) -> Dict[str, Dict[str, Optional[float]]]:
+    # Walking away from the factual value on each side, the first value at
+    # which the event clears ("below"/"above"); None if it persists throughout.
+    base = dict(SWEEP_BASE, **(base or {}))
+    thresholds: Dict[str, Dict[str, Optional[float]]] = {}
+    for name, outcomes in results.items():
+        sides: Dict[str, Optional[float]] = {}
+        for side, sign in (("below", -1.0), ("above", 1.0)):
+            tried = sorted(
+                ((value, persists) for value, persists in outcomes if (value - base[name]) * sign > 0.0),
+                key=lambda item: abs(item[0] - base[name]),
+            )
+            if tried:
+                sides[side] = next((value for value, persists in tried if not persists), None)
+        thresholds[name] = sides
+    return thresholds
+
+
+def format_sweep_result(
+    results: Dict[str, List[Tuple[float, bool]]], base: Optional[Dict[str, float]] = None
+) -> List[str]:
+    base = dict(SWEEP_BASE, **(base or {}))
+    lines = []
+    for name, sides in sweep_thresholds(results, base).items():
+        for side, threshold in sides.items():
+            relation = "<" if side == "below" else ">"
+            if threshold is None:
+                sign = -1.0 if side == "below" else 1.0
+                extreme = max(
+                    (value for value, _persists in results[name] if (value - base[name]) * sign > 0.0),
+                    key=lambda value: abs(value - base[name]),
+                )
+                lines.append(f"{name} {relation} {base[name]:g}: persists through {extreme:g}")
+            else:
+                lines.append(f"{name} {relation} {base[name]:g}: clears at {threshold:g}")
+    return lines
+
+
 def wrap_text(font, text: str, max_width: int) -> List[str]:
     words = text.split()
     if not words:
@@ -1459,167 +3472,249 @@ def draw_series(pygame, surface, rect, series: List[float], color: Tuple[int, in
         pygame.draw.lines(surface, color, False, points, 2)
 
 
-def heatmap_color(value: float, water: bool) -> Tuple[int, int, int]:
+def heatmap_color(value: float, water: bool, layer: str = "plants") -> Tuple[int, int, int]:
     if water:
         return (18, 30, 46)
     value = clamp_unit(value)
-    low = (16, 24, 16)
-    mid = (40, 110, 60)
-    high = (170, 220, 120)
+    low, mid, high = HEATMAP_RAMPS[layer]
     if value < 0.5:
         return blend_color(low, mid, smoothstep(value * 2.0))
     return blend_color(mid, high, smoothstep((value - 0.5) * 2.0))
 
 
-def draw_heatmap(
-    pygame,
-    surface,
-    rect,
-    values: List[float],
-    width: int,
-    height: int,
-    water_mask: Optional[List[bool]],
-) -> None:
-    if rect.width < 2 or rect.height < 2 or width <= 0 or height <= 0:
-        return
-    heat_surface = pygame.Surface((width, height))
-    for y in range(height):
-        row = y * width
-        for x in range(width):
-            idx = row + x
-            water = water_mask[idx] if water_mask else False
-            heat_surface.set_at((x, y), heatmap_color(values[idx], water))
-    scaled = pygame.transform.scale(heat_surface, (rect.width, rect.height))
-    surface.blit(scaled, rect)
+HEATMAP_WATER_INDEX = 255
+
+
+def heatmap_palette(layer: str = "plants") -> List[Tuple[int, int, int]]:
+    # heatmap_color at HEATMAP_WATER_INDEX evenly spaced levels, then water.
+    top = HEATMAP_WATER_INDEX - 1
+    palette = [heatmap_color(level / top, False, layer) for level in range(HEATMAP_WATER_INDEX)]
+    palette.append(heatmap_color(0.0, True, layer))
+    return palette
+
+
+def heatmap_indices(values, water_mask: Optional[List[bool]]):
+    # Palette index per cell: the value quantized to 0..254, or HEATMAP_WATER_INDEX.
+    top = HEATMAP_WATER_INDEX - 1
+    if np is not None:
+        indices = (np.clip(np.asarray(values, dtype=np.float64), 0.0, 1.0) * top + 0.5).astype(np.uint8)
+        if water_mask:
+            indices[np.asarray(water_mask, dtype=bool)] = HEATMAP_WATER_INDEX
+        return indices
+    indices = bytearray(int(clamp_unit(value) * top + 0.5) for value in values)
+    if water_mask:
+        for idx, water in enumerate(water_mask):
+            if water:
+                indices[idx] = HEATMAP_WATER_INDEX
+    return indices
+
+
+class DashboardPanel:
+    """Retained-mode dashboard: a cached panel surface redrawn region by region.
+
+    The background, frames, grid lines and headings are drawn once into a static
+    layer. update() compares each dynamic region's inputs with the previous frame
+    and only restores and redraws the regions that changed, returning their
+    rects so the caller can copy and present just those. The heatmap is an
+    8-bit surface over the layer's 256-entry palette; it is only re-quantized
+    when the caller's heatmap_key changes, and then refreshed by copying the
+    index bytes in one go when any index moved.
+    """
+
+    def __init__(self, pygame, size: Tuple[int, int], font, heatmap_width: int, heatmap_height: int) -> None:
+        self.pygame = pygame
+        self.font = font
+        self.surface = pygame.Surface(size)
+        self.static = pygame.Surface(size)
+        self.heat_surface = None
+        self.heatmap_width = heatmap_width
+        self.heatmap_height = heatmap_height
+        self.heatmap_layer = HEATMAP_LAYERS[0]
+        self.palette = heatmap_palette(self.heatmap_layer)
+        self.heat_indices = None
+        self.keys: Dict[str, object] = {}
+        self._layout(size)
+        self.surface.blit(self.static, (0, 0))
+
+    def _layout(self, size: Tuple[int, int]) -> None:
+        pygame = self.pygame
+        font = self.font
+        screen = self.static
+        panel_rect = pygame.Rect(0, 0, size[0], size[1])
+        subtitle_color = (170, 170, 185)
+        pygame.draw.rect(screen, DASHBOARD_BG, panel_rect)
+        pygame.draw.rect(screen, DASHBOARD_BORDER, panel_rect, 1)
+        padding = 10
+        cursor_x = panel_rect.left + padding
+        cursor_y = panel_rect.top + padding
+        title = font.render("Dashboard", True, DASHBOARD_TEXT)
+        screen.blit(title, (cursor_x, cursor_y))
+        cursor_y += title.get_height() + 6
+        subtitle = font.render("Timeseries", True, subtitle_color)
+        screen.blit(subtitle, (cursor_x, cursor_y))
+        cursor_y += subtitle.get_height() + 6
+        plot_height = int(panel_rect.height * 0.35)
+        plot_rect = pygame.Rect(cursor_x, cursor_y, panel_rect.width - padding * 2, plot_height)
+        pygame.draw.rect(screen, (26, 26, 32), plot_rect)
+        for idx in range(1, 4):
+            y = plot_rect.top + int(plot_rect.height * idx / 4)
+            pygame.draw.line(screen, (40, 40, 46), (plot_rect.left, y), (plot_rect.right, y), 1)
+        self.plot_rect = plot_rect
+        cursor_y = plot_rect.bottom + 8
+        self.legend_rect = pygame.Rect(cursor_x, cursor_y, plot_rect.width, (font.get_height() + 4) * 3)
+        cursor_y = self.legend_rect.bottom + 4
+        heading_height = font.size("Heatmap (Plants)")[1]
+        self.heading_rect = pygame.Rect(cursor_x, cursor_y, plot_rect.width, heading_height)
+        cursor_y += heading_height + 6
+        heatmap_height_px = min(panel_rect.width - padding * 2, max(60, int(panel_rect.height * 0.25)))
+        heatmap_rect = pygame.Rect(cursor_x, cursor_y, panel_rect.width - padding * 2, heatmap_height_px)
+        pygame.draw.rect(screen, (26, 26, 32), heatmap_rect)
+        self.heatmap_rect = heatmap_rect.inflate(-4, -4)
+        cursor_y = heatmap_rect.bottom + 8
+        subtitle = font.render("Events", True, subtitle_color)
+        screen.blit(subtitle, (cursor_x, cursor_y))
+        cursor_y += subtitle.get_height() + 6
+        self.events_rect = pygame.Rect(
+            cursor_x, cursor_y, panel_rect.width - padding * 2, max(0, panel_rect.bottom - cursor_y)
+        )
+        self.padding = padding
 
+    def _restore(self, rect) -> None:
+        self.surface.blit(self.static, rect, rect)
 
-def draw_dashboard_panel(
-    pygame,
-    screen,
-    panel_rect,
-    font,
-    plant_history: List[float],
-    herb_history: List[float],
-    pred_history: List[float],
-    heatmap_values: List[float],
-    heatmap_width: int,
-    heatmap_height: int,
-    heatmap_water_mask: Optional[List[bool]],
-    event_rows: List[Tuple[str, str, bool]],
-    story_text: str,
-) -> None:
-    panel_bg = (18, 18, 22)
-    panel_border = (60, 60, 70)
-    text_color = (220, 220, 230)
-    subtitle_color = (170, 170, 185)
-    plant_color = (80, 200, 120)
-    herb_color = (220, 200, 80)
-    pred_color = (220, 80, 80)
-    pygame.draw.rect(screen, panel_bg, panel_rect)
-    pygame.draw.rect(screen, panel_border, panel_rect, 1)
-    padding = 10
-    cursor_x = panel_rect.left + padding
-    cursor_y = panel_rect.top + padding
-    title = font.render("Dashboard", True, text_color)
-    screen.blit(title, (cursor_x, cursor_y))
-    cursor_y += title.get_height() + 6
-    subtitle = font.render("Timeseries", True, subtitle_color)
-    screen.blit(subtitle, (cursor_x, cursor_y))
-    cursor_y += subtitle.get_height() + 6
-    plot_height = int(panel_rect.height * 0.35)
-    plot_rect = pygame.Rect(
-        cursor_x,
-        cursor_y,
-        panel_rect.width - padding * 2,
-        plot_height,
-    )
-    pygame.draw.rect(screen, (26, 26, 32), plot_rect)
-    for idx in range(1, 4):
-        y = plot_rect.top + int(plot_rect.height * idx / 4)
-        pygame.draw.line(screen, (40, 40, 46), (plot_rect.left, y), (plot_rect.right, y), 1)
-    inner_plot = plot_rect.inflate(-4, -4)
-    pop_scale = 1.0
-    if herb_history:
-        pop_scale = max(pop_scale, max(herb_history))
-    if pred_history:
-        pop_scale = max(pop_scale, max(pred_history))
-    draw_series(pygame, screen, inner_plot, plant_history, plant_color, 1.0)
-    draw_series(pygame, screen, inner_plot, herb_history, herb_color, pop_scale)
-    draw_series(pygame, screen, inner_plot, pred_history, pred_color, pop_scale)
-    cursor_y = plot_rect.bottom + 8
-    plant_value = plant_history[-1] if plant_history else 0.0
-    herb_value = herb_history[-1] if herb_history else 0.0
-    pred_value = pred_history[-1] if pred_history else 0.0
-    entries = [
-        (plant_color, f"Plants: {plant_value:.2f}"),
-        (herb_color, f"Herb: {int(round(herb_value))}"),
-        (pred_color, f"Pred: {int(round(pred_value))}"),
-    ]
-    for color, text in entries:
-        label = font.render(text, True, color)
-        screen.blit(label, (cursor_x, cursor_y))
-        cursor_y += label.get_height() + 4
-    cursor_y += 4
-    subtitle = font.render("Heatmap (Plants)", True, subtitle_color)
-    screen.blit(subtitle, (cursor_x, cursor_y))
-    cursor_y += subtitle.get_height() + 6
-    heatmap_height_px = min(panel_rect.width - padding * 2, max(60, int(panel_rect.height * 0.25)))
-    heatmap_rect = pygame.Rect(
-        cursor_x,
-        cursor_y,
-        panel_rect.width - padding * 2,
-        heatmap_height_px,
-    )
-    pygame.draw.rect(screen, (26, 26, 32), heatmap_rect)
-    inner_heatmap = heatmap_rect.inflate(-4, -4)
-    draw_heatmap(
-        pygame,
-        screen,
-        inner_heatmap,
+    def set_heatmap_layer(self, layer: str) -> None:
+        if layer not in HEATMAP_LAYERS:
+            raise ValueError(f"Unknown heatmap layer {layer!r}; expected one of {', '.join(HEATMAP_LAYERS)}.")
+        if layer != self.heatmap_layer:
+            self.heatmap_layer = layer
+            self.palette = heatmap_palette(layer)
+            self.heat_indices = None
+
+    def update(
+        self,
+        plant_history: RingHistory,
+        herb_history: RingHistory,
+        pred_history: RingHistory,
         heatmap_values,
-        heatmap_width,
-        heatmap_height,
-        heatmap_water_mask,
-    )
-    cursor_y = heatmap_rect.bottom + 8
-    subtitle = font.render("Events", True, subtitle_color)
-    screen.blit(subtitle, (cursor_x, cursor_y))
-    cursor_y += subtitle.get_height() + 6
-    event_colors = {
-        "Extinction": (190, 70, 70),
-        "Crash": (210, 150, 70),
-        "Regime shift": (80, 170, 190),
-    }
-    for label, detail, active in event_rows:
-        if cursor_y >= panel_rect.bottom - padding:
-            break
-        badge_text = label if not detail else f"{label}: {detail}"
-        badge_color = event_colors.get(label, panel_border)
-        if not active:
-            badge_color = (45, 45, 52)
-        text_tint = (240, 240, 240) if active else (150, 150, 160)
-        badge = font.render(badge_text, True, text_tint)
-        badge_rect = pygame.Rect(
-            cursor_x,
-            cursor_y,
-            panel_rect.width - padding * 2,
-            badge.get_height() + 6,
+        heatmap_water_mask: Optional[List[bool]],
+        event_rows: List[Tuple[str, str, bool]],
+        story_text: str,
+        heatmap_key: object = None,
+    ) -> list:
+        """Redraw regions whose data changed; returns their panel-local rects.
+
+        heatmap_key identifies the heatmap data (e.g. the step index); the
+        grid is only re-quantized when it changes, or every call if it is None.
+        """
+        pygame = self.pygame
+        font = self.font
+        dirty = []
+        pop_scale = max(1.0, herb_history.window_max(), pred_history.window_max())
+        series_key = tuple(
+            (len(series), series[0] if series else None, series[-1] if series else None)
+            for series in (plant_history, herb_history, pred_history)
+        ) + (pop_scale,)
+        if self.keys.get("series") != series_key:
+            self.keys["series"] = series_key
+            self._restore(self.plot_rect)
+            inner_plot = self.plot_rect.inflate(-4, -4)
+            draw_series(pygame, self.surface, inner_plot, plant_history, DASHBOARD_PLANT, 1.0)
+            draw_series(pygame, self.surface, inner_plot, herb_history, DASHBOARD_HERB, pop_scale)
+            draw_series(pygame, self.surface, inner_plot, pred_history, DASHBOARD_PRED, pop_scale)
+            dirty.append(self.plot_rect)
+        plant_value = plant_history[-1] if plant_history else 0.0
+        herb_value = herb_history[-1] if herb_history else 0.0
+        pred_value = pred_history[-1] if pred_history else 0.0
+        entries = (
+            (DASHBOARD_PLANT, f"Plants: {plant_value:.2f}"),
+            (DASHBOARD_HERB, f"Herb: {int(round(herb_value))}"),
+            (DASHBOARD_PRED, f"Pred: {int(round(pred_value))}"),
         )
-        pygame.draw.rect(screen, badge_color, badge_rect)
-        pygame.draw.rect(screen, panel_border, badge_rect, 1)
-        screen.blit(badge, (badge_rect.left + 6, badge_rect.top + 3))
-        cursor_y = badge_rect.bottom + 6
-    if story_text and cursor_y < panel_rect.bottom - padding:
-        subtitle = font.render("Story", True, subtitle_color)
-        screen.blit(subtitle, (cursor_x, cursor_y))
-        cursor_y += subtitle.get_height() + 6
-        max_width = panel_rect.width - padding * 2
-        for line in wrap_text(font, story_text, max_width):
-            if cursor_y >= panel_rect.bottom - padding:
+        if self.keys.get("legend") != entries:
+            self.keys["legend"] = entries
+            self._restore(self.legend_rect)
+            cursor_y = self.legend_rect.top
+            for color, text in entries:
+                label = font.render(text, True, color)
+                self.surface.blit(label, (self.legend_rect.left, cursor_y))
+                cursor_y += label.get_height() + 4
+            dirty.append(self.legend_rect)
+        if self.keys.get("heading") != self.heatmap_layer:
+            self.keys["heading"] = self.heatmap_layer
+            self._restore(self.heading_rect)
+            heading = font.render(f"Heatmap ({self.heatmap_layer.title()})", True, (170, 170, 185))
+            self.surface.blit(heading, self.heading_rect.topleft)
+            dirty.append(self.heading_rect)
+        heat_key = (self.heatmap_layer, heatmap_key)
+        if heatmap_key is None or self.keys.get("heatmap") != heat_key:
+            self.keys["heatmap"] = heat_key
+            if self._update_heat_surface(heatmap_values, heatmap_water_mask):
+                rect = self.heatmap_rect
+                if rect.width >= 2 and rect.height >= 2:
+                    self.surface.blit(pygame.transform.scale(self.heat_surface, rect.size), rect)
+                    dirty.append(rect)
+        events_key = (tuple(event_rows), story_text)
+        if self.keys.get("events") != events_key:
+            self.keys["events"] = events_key
+            self._draw_events(event_rows, story_text)
+            dirty.append(self.events_rect)
+        return dirty
+
+    def _update_heat_surface(self, values, water_mask: Optional[List[bool]]) -> bool:
+        size = (self.heatmap_width, self.heatmap_height)
+        if size[0] <= 0 or size[1] <= 0:
+            return False
+        indices = heatmap_indices(values, water_mask)
+        if np is not None:
+            data = indices.tobytes()
+        else:
+            data = bytes(indices)
+        if data == self.heat_indices:
+            return False
+        # frombuffer shares the bytes, so they stay referenced alongside the surface.
+        self.heat_indices = data
+        self.heat_surface = self.pygame.image.frombuffer(data, size, "P")
+        self.heat_surface.set_palette(self.palette)
+        return True
+
+    def _draw_events(self, event_rows: List[Tuple[str, str, bool]], story_text: str) -> None:
+        pygame = self.pygame
+        font = self.font
+        screen = self.surface
+        self._restore(self.events_rect)
+        padding = self.padding
+        panel_bottom = screen.get_height()
+        cursor_x = self.events_rect.left
+        cursor_y = self.events_rect.top
+        event_colors = {
+            "Extinction": (190, 70, 70),
+            "Crash": (210, 150, 70),
+            "Regime shift": (80, 170, 190),
+        }
+        for label, detail, active in event_rows:
+            if cursor_y >= panel_bottom - padding:
                 break
-            line_surface = font.render(line, True, text_color)
-            screen.blit(line_surface, (cursor_x, cursor_y))
-            cursor_y += line_surface.get_height() + 2
+            badge_text = label if not detail else f"{label}: {detail}"
+            badge_color = event_colors.get(label, DASHBOARD_BORDER)
+            if not active:
+                badge_color = (45, 45, 52)
+            text_tint = (240, 240, 240) if active else (150, 150, 160)
+            badge = font.render(badge_text, True, text_tint)
+            badge_rect = pygame.Rect(cursor_x, cursor_y, self.events_rect.width, badge.get_height() + 6)
+            pygame.draw.rect(screen, badge_color, badge_rect)
+            pygame.draw.rect(screen, DASHBOARD_BORDER, badge_rect, 1)
+            screen.blit(badge, (badge_rect.left + 6, badge_rect.top + 3))
+            cursor_y = badge_rect.bottom + 6
+        if story_text and cursor_y < panel_bottom - padding:
+            subtitle = font.render("Story", True, (170, 170, 185))
+            screen.blit(subtitle, (cursor_x, cursor_y))
+            cursor_y += subtitle.get_height() + 6
+            for line in wrap_text(font, story_text, self.events_rect.width):
+                if cursor_y >= panel_bottom - padding:
+                    break
+                line_surface = font.render(line, True, DASHBOARD_TEXT)
+                screen.blit(line_surface, (cursor_x, cursor_y))
+                cursor_y += line_surface.get_height() + 2
 
 
 def run_window(sim: Simulation) -> int:
@@ -1638,7 +3733,14 @@ def run_window(sim: Simulation) -> int:
     panel_width = max(200, view_size[0] // 3)
     screen = pygame.display.set_mode((view_size[0] + panel_width, view_size[1]))
     pygame.display.set_caption("Microverse")
-    base_surface, base_colors, water_mask, normals = build_world_surface(sim)
+    base_surface, base_colors, water_mask, normals, lighting_basis = build_world_surface(sim)
+    shading = build_shading_arrays(base_colors, normals, water_mask, sim.width, sim.height, sim.heights)
+    terrain_pyramid = None
+    if shading is not None:
+        terrain_pyramid = build_terrain_pyramid(shading, sim.width, sim.height)
+    terrain_colors = None
+    lighting_cache = LightingCache(sim.width, sim.height)
+    lighting_key: Optional[tuple] = None
     if scale != 1:
         world_surface = pygame.Surface(world_size)
     else:
@@ -1671,19 +3773,26 @@ def run_window(sim: Simulation) -> int:
     font = pygame.font.Font(None, 20)
     clock = pygame.time.Clock()
     history_len = 300
-    plant_history: List[float] = []
-    herb_history: List[float] = []
-    pred_history: List[float] = []
     event_age = {"extinction": 0, "crash": 0, "regime": 0}
     event_detail = {"extinction": "", "crash": "", "regime": ""}
     story_text = ""
     story_age = 0
     crash_window = min(CRASH_WINDOW, history_len)
     regime_window = min(REGIME_WINDOW, max(1, history_len // 2))
-    counterfactual_cache: Dict[Tuple[str, str], bool] = {}
+    plant_history = new_history(history_len, crash_window, regime_window)
+    herb_history = new_history(history_len, crash_window, regime_window)
+    pred_history = new_history(history_len, crash_window, regime_window)
+    counterfactual_jobs = CounterfactualQueue()
+    story_base = ""
+    story_key: Optional[tuple] = None
+    awaiting_logs: Dict[tuple, List[Tuple[Dict[str, object], str]]] = {}
+    checkpoints: deque = deque(maxlen=CHECKPOINT_RING)
     last_sim_dt = 1.0 / 60.0
     panel_rect = pygame.Rect(view_size[0], 0, panel_width, view_size[1])
     view_area = pygame.Rect(0, 0, view_size[0], view_size[1])
+    dashboard = DashboardPanel(pygame, panel_rect.size, font, sim.width, sim.height)
+    screen.blit(dashboard.surface, panel_rect)
+    full_redraw = True
     pending_screenshot: Optional[str] = None
     pending_report: Optional[str] = None
     video_writer: Optional[AviWriter] = None
@@ -1704,38 +3813,95 @@ def run_window(sim: Simulation) -> int:
         "event_log": [],
     }
 
-    def counterfactual_line(label: str, detail: str) -> str:
-        steps = max(1, sim_steps)
-        if sim_steps > 0:
-            dt = max(1e-4, sim_time / sim_steps)
-        else:
-            dt = max(1e-4, last_sim_dt)
-        key = event_key(label, detail)
-        if key not in counterfactual_cache:
-            counterfactual_cache[key] = run_counterfactual(
-                sim.seed,
-                sim.width,
-                sim.height,
-                steps,
-                dt,
-                label,
-                detail,
+    def take_checkpoint() -> None:
+        checkpoints.append(
+            (
+                sim_steps,
+                sim_time,
+                sim.snapshot(),
+                (list(plant_history), list(herb_history), list(pred_history)),
             )
-        return format_counterfactual_result(counterfactual_cache[key])
+        )
 
-    def log_event(label: str, detail: str, story: str) -> None:
-        event_log.append(
-            {
-                "label": label,
-                "detail": detail,
-                "tick": sim.tick,
-                "sim_time": sim_time,
-                "story": story,
-            }
+    def counterfactual_line(label: str, detail: str) -> Tuple[tuple, str]:
+        # Branch from the newest checkpoint that predates the samples the event
+        # detector looked at; fall back to a replay from tick 0 without one.
+        # Returns the job key (event, branch point, laws) and the story clause.
+        lookback = 2 * regime_window if label == "Regime shift" else crash_window
+        branch = None
+        for checkpoint in reversed(checkpoints):
+            if checkpoint[0] <= sim_steps - lookback:
+                branch = checkpoint
+                break
+        start_steps, start_time, state, histories = branch if branch else (0, 0.0, None, None)
+        steps = max(1, sim_steps - start_steps)
+        if sim_steps > start_steps:
+            dt = max(1e-4, (sim_time - start_time) / (sim_steps - start_steps))
+        else:
+            dt = max(1e-4, last_sim_dt)
+        laws = (law_temp_offset, law_rain_multiplier, law_gravity)
+        key = (event_key(label, detail), start_steps, laws)
+        persists = counterfactual_jobs.submit(
+            key,
+            sim.seed,
+            sim.width,
+            sim.height,
+            steps,
+            dt,
+            label,
+            detail,
+            agent_mode=sim.agent_mode,
+            rng_mode=sim.rng_mode,
+            checkpoint=state,
+            histories=histories,
+            temp_offset=law_temp_offset,
+            rain_multiplier=law_rain_multiplier,
+            gravity=law_gravity,
         )
-        report_snapshot["event_log"] = list(event_log)
+        return key, format_counterfactual_result(persists)
+
+    def tell_story(label: str, detail: str, story: str) -> None:
+        nonlocal story_age, story_text, story_base, story_key
+        key, result = counterfactual_line(label, detail)
+        story_base = story
+        story_key = key
+        story_text = f"{story} {result}"
+        story_age = EVENT_HOLD_STEPS
+        print(f"EVENT: {label} ({detail}) STORY: {story_text}")
+        entry = log_event(label, detail, story_text)
+        if key not in counterfactual_jobs.cache:
+            awaiting_logs.setdefault(key, []).append((entry, story))
+
+    def collect_counterfactuals() -> None:
+        # Fill finished results into the live story and the logged events.
+        nonlocal story_text
+        finished, dropped = counterfactual_jobs.poll()
+        for key in finished + dropped:
+            if key in counterfactual_jobs.cache:
+                result = format_counterfactual_result(counterfactual_jobs.cache[key])
+            else:
+                result = format_counterfactual_result(None, dropped=True)
+            label, detail = key[0]
+            print(f"COUNTERFACTUAL: {label} ({detail}): {result}")
+            if key == story_key and story_text:
+                story_text = f"{story_base} {result}"
+            for entry, story in awaiting_logs.pop(key, []):
+                entry["story"] = f"{story} {result}"
+
+    def log_event(label: str, detail: str, story: str) -> Dict[str, object]:
+        entry: Dict[str, object] = {
+            "label": label,
+            "detail": detail,
+            "tick": sim.tick,
+            "sim_time": sim_time,
+            "story": story,
+        }
+        event_log.append(entry)
+        return entry
 
     def update_report_snapshot() -> None:
+        # Copied only when a report is written, not every sample.
+        report_snapshot["event_log"] = list(event_log)
         report_snapshot["tick"] = sim.tick
         report_snapshot["sim_time"] = sim_time
         report_snapshot["plant_history"] = list(plant_history)
@@ -1744,7 +3910,7 @@ def run_window(sim: Simulation) -> int:
         report_snapshot["plant_biomass"] = list(sim.plant_biomass)
 
     def update_events() -> None:
-        nonlocal story_age, story_text
+        nonlocal story_age, story_text, story_key
         for key in event_age:
             if event_age[key] > 0:
                 event_age[key] -= 1
@@ -1754,10 +3920,11 @@ def run_window(sim: Simulation) -> int:
             story_age -= 1
             if story_age == 0:
                 story_text = ""
+                story_key = None
         herb_count = int(round(herb_history[-1])) if herb_history else 0
         pred_count = int(round(pred_history[-1])) if pred_history else 0
         plant_mean = plant_history[-1] if plant_history else 0.0
-        moisture_mean = mean(sim.moisture)
+        moisture_mean = sim.stats()["moisture_mean"]
         events = detect_event_details(
             plant_history,
             herb_history,
@@ -1768,7 +3935,7 @@ def run_window(sim: Simulation) -> int:
         if "Extinction" in events:
             detail, _ = events["Extinction"]
             if event_age["extinction"] == 0 or event_detail["extinction"] != detail:
-                story_text = build_causal_story(
+                story = build_causal_story(
                     "Extinction",
                     detail.split(", "),
                     plant_mean,
@@ -1777,16 +3944,13 @@ def run_window(sim: Simulation) -> int:
                     pred_count,
                     herb_history,
                 )
-                story_text = f"{story_text} {counterfactual_line('Extinction', detail)}"
-                story_age = EVENT_HOLD_STEPS
-                print(f"EVENT: Extinction ({detail}) STORY: {story_text}")
-                log_event("Extinction", detail, story_text)
+                tell_story("Extinction", detail, story)
             event_age["extinction"] = EVENT_HOLD_STEPS
             event_detail["extinction"] = detail
         if "Crash" in events:
             detail, _ = events["Crash"]
             if event_age["crash"] == 0 or event_detail["crash"] != detail:
-                story_text = build_causal_story(
+                story = build_causal_story(
                     "Crash",
                     detail.split(", "),
                     plant_mean,
@@ -1795,16 +3959,13 @@ def run_window(sim: Simulation) -> int:
                     pred_count,
                     herb_history,
                 )
-                story_text = f"{story_text} {counterfactual_line('Crash', detail)}"
-                story_age = EVENT_HOLD_STEPS
-                print(f"EVENT: Crash ({detail}) STORY: {story_text}")
-                log_event("Crash", detail, story_text)
+                tell_story("Crash", detail, story)
             event_age["crash"] = EVENT_HOLD_STEPS
             event_detail["crash"] = detail
         if "Regime shift" in events:
             detail, delta = events["Regime shift"]
             if event_age["regime"] == 0 or event_detail["regime"] != detail:
-                story_text = build_causal_story(
+                story = build_causal_story(
                     "Regime shift",
                     [],
                     plant_mean,
@@ -1814,30 +3975,28 @@ def run_window(sim: Simulation) -> int:
                     herb_history,
                     plant_delta=delta,
                 )
-                story_text = f"{story_text} {counterfactual_line('Regime shift', detail)}"
-                story_age = EVENT_HOLD_STEPS
-                print(f"EVENT: Regime shift ({detail}) STORY: {story_text}")
-                log_event("Regime shift", detail, story_text)
+                tell_story("Regime shift", detail, story)
             event_age["regime"] = EVENT_HOLD_STEPS
             event_detail["regime"] = detail
 
     def sample_history() -> None:
-        plant_mean = 0.0
-        if sim.plant_biomass:
-            plant_mean = sum(sim.plant_biomass) / len(sim.plant_biomass)
-        update_history(plant_history, plant_mean, history_len)
-        update_history(herb_history, float(len(sim.herbivore_x)), history_len)
-        update_history(pred_history, float(len(sim.predator_x)), history_len)
+        stats = sim.stats()
+        plant_history.append(stats["plant_mean"])
+        herb_history.append(float(stats["herbivores"]))
+        pred_history.append(float(stats["predators"]))
         update_events()
-        update_report_snapshot()
 
     sample_history()
+    take_checkpoint()
     running = True
     while running:
         frame_dt = clock.tick(60) / 1000.0
+        collect_counterfactuals()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type == pygame.VIDEOEXPOSE:
+                full_redraw = True
             elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
                 running = False
             elif event.type == pygame.KEYDOWN:
@@ -1885,6 +4044,9 @@ def run_window(sim: Simulation) -> int:
                     view_mode_3d = not view_mode_3d
                 elif event.key == pygame.K_c:
                     quality_index = (quality_index + 1) % len(VIEW3D_QUALITY_PRESETS)
+                elif event.key == pygame.K_l:
+                    layer_index = HEATMAP_LAYERS.index(dashboard.heatmap_layer)
+                    dashboard.set_heatmap_layer(HEATMAP_LAYERS[(layer_index + 1) % len(HEATMAP_LAYERS)])
                 elif event.key == pygame.K_LEFTBRACKET:
                     law_sun_offset = clamp_range(
                         law_sun_offset - LAW_SUN_OFFSET_STEP,
@@ -2004,6 +4166,8 @@ def run_window(sim: Simulation) -> int:
             sim_steps += 1
             last_sim_dt = sim_dt
             sample_history()
+            if sim_steps % CHECKPOINT_INTERVAL == 0:
+                take_checkpoint()
         if view_mode_3d:
             dynamic_timer += frame_dt
             if dynamic_timer >= VIEW3D_RES_UPDATE_SECS:
@@ -2023,26 +4187,31 @@ def run_window(sim: Simulation) -> int:
         else:
             dynamic_timer = 0.0
         sun_dir, sun_height, sky_color = sun_state(sim_time, law_sun_offset)
-        render_lit_surface(
-            base_surface,
-            base_colors,
-            normals,
-            water_mask,
-            sun_dir,
-            sun_height,
-            sky_color,
-            sim.width,
-            sim.height,
-        )
-        if scale != 1:
-            pygame.transform.scale(base_surface, world_size, world_surface)
+        light_key, light_dir, light_height, light_sky = quantize_sun_state(sun_dir, sun_height, sky_color)
+        if light_key != lighting_key:
+            cached_surface = lighting_cache.get(light_key)
+            if cached_surface is None:
+                lit_rgb = lighting_basis.relight(light_dir, light_height, light_sky)
+                lit_surface = pygame.image.frombuffer(lit_rgb, (sim.width, sim.height), "RGB")
+                base_surface.blit(lit_surface, (0, 0))
+                lighting_cache.put(light_key, base_surface.copy())
+            else:
+                base_surface.blit(cached_surface, (0, 0))
+            if scale != 1:
+                pygame.transform.scale(base_surface, world_size, world_surface)
+            lighting_key = light_key
+            terrain_colors = None
         view_rect = pygame.Rect(int(camera_x), int(camera_y), view_size[0], view_size[1])
-        screen.fill(sky_color)
+        screen.fill(sky_color, view_area)
         if view_mode_3d:
             quality = VIEW3D_QUALITY_PRESETS[quality_index]
             quality_step = float(quality["step"])
             quality_vertical = float(quality["vertical_scale"])
             max_distance = max(sim.width, sim.height) * float(quality["max_dist_scale"])
+            if terrain_pyramid is not None:
+                max_distance *= VIEW3D_LOD_REACH
+                if terrain_colors is None:
+                    terrain_colors = preshade_terrain(terrain_pyramid, light_dir, light_height, light_sky)
             render_width = max(2, int(view_area.width * dynamic_scale))
             render_height = max(2, int(view_area.height * quality_vertical * dynamic_scale))
             if render_width == view_area.width and render_height == view_area.height:
@@ -2069,6 +4238,9 @@ def run_window(sim: Simulation) -> int:
                     view_area.height,
                     quality_step,
                     max_distance,
+                    shading=shading,
+                    pyramid=terrain_pyramid,
+                    terrain_colors=terrain_colors,
                 )
             else:
                 if render_surface is None or render_surface.get_size() != (render_width, render_height):
@@ -2098,6 +4270,9 @@ def run_window(sim: Simulation) -> int:
                     view_area.height,
                     quality_step,
                     max_distance,
+                    shading=shading,
+                    pyramid=terrain_pyramid,
+                    terrain_colors=terrain_colors,
                 )
                 if scaled_surface is None:
                     scaled_surface = pygame.Surface(view_area.size)
@@ -2110,21 +4285,21 @@ def run_window(sim: Simulation) -> int:
             ("Crash", event_detail["crash"], event_age["crash"] > 0),
             ("Regime shift", event_detail["regime"], event_age["regime"] > 0),
         ]
-        draw_dashboard_panel(
-            pygame,
-            screen,
-            panel_rect,
-            font,
+        # The view is redrawn every frame; the panel only where update() changed it.
+        screen_dirty = [view_area]
+        for rect in dashboard.update(
             plant_history,
             herb_history,
             pred_history,
-            sim.plant_biomass,
-            sim.width,
-            sim.height,
+            sim.moisture if dashboard.heatmap_layer == "moisture" else sim.plant_biomass,
             sim.water_mask,
             event_rows,
             story_text,
-        )
+            heatmap_key=sim.step_index,
+        ):
+            screen_rect = rect.move(panel_rect.topleft)
+            screen.blit(dashboard.surface, screen_rect, rect)
+            screen_dirty.append(screen_rect)
         quality = VIEW3D_QUALITY_PRESETS[quality_index]
         quality_name = str(quality["name"])
         quality_vertical = float(quality["vertical_scale"])
@@ -2197,7 +4372,12 @@ def run_window(sim: Simulation) -> int:
             else:
                 print(f"EXPORT: saved report to {pending_report}")
             pending_report = None
-        pygame.display.flip()
+        if full_redraw:
+            pygame.display.flip()
+            full_redraw = False
+        else:
+            pygame.display.update(screen_dirty)
+    counterfactual_jobs.shutdown()
     if video_writer:
         video_writer.close()
         if video_path:
@@ -2206,6 +4386,557 @@ def run_window(sim: Simulation) -> int:
     return 0
 
 
+def spawn_initial_agents(sim: Simulation) -> None:
+    # One batch of each species, as the B and N keys spawn in the window.
+    sim.spawn_herbivores(max(4, (sim.width * sim.height) // HERBIVORE_DENSITY))
+    sim.spawn_predators(max(2, (sim.width * sim.height) // PREDATOR_DENSITY))
+
+
+def run_sweep(sim: Simulation, steps: int, dt: float, workers: Optional[int] = None) -> int:
+    # Headless: seed the initial agents, advance until the first event, then
+    # sweep it from the newest checkpoint that predates its detection window,
+    # as the window would.
+    history_len = 300
+    crash_window = min(CRASH_WINDOW, history_len)
+    regime_window = min(REGIME_WINDOW, max(1, history_len // 2))
+    plant_history = new_history(history_len, crash_window, regime_window)
+    herb_history = new_history(history_len, crash_window, regime_window)
+    pred_history = new_history(history_len, crash_window, regime_window)
+    checkpoints: deque = deque(maxlen=CHECKPOINT_RING)
+    base = {"rainfall_scale": sim.rainfall_scale}
+    spawn_initial_agents(sim)
+    initial = sim.snapshot()
+    event = None
+    for step in range(steps + 1):
+        if step:
+            sim.step(dt)
+        stats = sim.stats()
+        plant_history.append(stats["plant_mean"])
+        herb_history.append(float(stats["herbivores"]))
+        pred_history.append(float(stats["predators"]))
+        events = detect_event_details(plant_history, herb_history, pred_history, crash_window, regime_window)
+        if events:
+            label, (detail, _delta) = next(iter(events.items()))
+            event = (step, label, detail)
+            break
+        if step % CHECKPOINT_INTERVAL == 0:
+            checkpoints.append((step, sim.snapshot(), (list(plant_history), list(herb_history), list(pred_history))))
+    if event is None:
+        print(f"SWEEP: no event within {steps} steps")
+        return 1
+    event_step, label, detail = event
+    lookback = 2 * regime_window if label == "Regime shift" else crash_window
+    start_step, state, histories = 0, initial, None
+    for checkpoint in reversed(checkpoints):
+        if checkpoint[0] <= event_step - lookback:
+            start_step, state, histories = checkpoint
+            break
+    print(f"SWEEP: {label} ({detail}) at step {event_step}; branching from step {start_step}")
+    results = sweep_counterfactuals(
+        sim.seed,
+        sim.width,
+        sim.height,
+        max(1, event_step - start_step),
+        dt,
+        label,
+        detail,
+        base=base,
+        agent_mode=sim.agent_mode,
+        rng_mode=sim.rng_mode,
+        checkpoint=state,
+        histories=histories,
+        workers=workers,
+    )
+    for line in format_sweep_result(results, base):
+        print(f"SWEEP: {line}")
+    return 0
+
+
+def run_batch_seed(
+    seed: int,
+    width: int,
+    height: int,
+    steps: int,
+    backend: str = "auto",
+    agent_mode: str = "sequential",
+    rng_mode: str = "lcg",
+) -> Dict[str, object]:
+    # One headless seed for --batch: initial agents, `steps` fixed steps, the
+    # event onsets detect_event_details reports along the way, and a summary.
+    sim = Simulation(width, height, seed, backend=backend, agent_mode=agent_mode, rng_mode=rng_mode)
+    spawn_initial_agents(sim)
+    history_len = 300
+    crash_window = min(CRASH_WINDOW, history_len)
+    regime_window = min(REGIME_WINDOW, max(1, history_len // 2))
+    plant_history = new_history(history_len, crash_window, regime_window)
+    herb_history = new_history(history_len, crash_window, regime_window)
+    pred_history = new_history(history_len, crash_window, regime_window)
+    herb_range = [math.inf, 0.0, 0.0]
+    pred_range = [math.inf, 0.0, 0.0]
+    active: Dict[str, str] = {}
+    events: List[Dict[str, object]] = []
+    for step in range(steps + 1):
+        if step:
+            sim.step(BATCH_DT)
+        stats = sim.stats()
+        plant_history.append(stats["plant_mean"])
+        for history, totals, name in ((herb_history, herb_range, "herbivores"), (pred_history, pred_range, "predators")):
+            count = float(stats[name])
+            history.append(count)
+            totals[0] = min(totals[0], count)
+            totals[1] = max(totals[1], count)
+            totals[2] += count
+        found = detect_event_details(plant_history, herb_history, pred_history, crash_window, regime_window)
+        for label, (detail, _delta) in found.items():
+            if active.get(label) != detail:
+                events.append({"step": step, "label": label, "detail": detail})
+        active = {label: detail for label, (detail, _delta) in found.items()}
+    stats = sim.stats()
+    return {
+        "seed": seed,
+        "width": width,
+        "height": height,
+        "steps": steps,
+        "backend": sim.backend,
+        "agent_mode": sim.agent_mode,
+        "rng_mode": sim.rng_mode,
+        "digest": sim.digest(),
+        "herbivores": stats["herbivores"],
+        "predators": stats["predators"],
+        "herbivores_min": int(herb_range[0]),
+        "herbivores_max": int(herb_range[1]),
+        "herbivores_mean": round(herb_range[2] / (steps + 1), 3),
+        "predators_min": int(pred_range[0]),
+        "predators_max": int(pred_range[1]),
+        "predators_mean": round(pred_range[2] / (steps + 1), 3),
+        "plant_mean": round(stats["plant_mean"], 6),
+        "events": events,
+    }
+
+
+def _batch_worker_init() -> None:
+    # Every batch task is a new seed, so cached worlds would only pile up.
+    WORLD_CACHE.max_entries = 0
+
+
+def load_batch_results(path: str, config: Dict[str, object]) -> set:
+    """Seeds already in a --batch results file made with the same config.
+
+    config holds the width, height, steps, backend, agent_mode and rng_mode
+    the run will use; a record counts only if every one of them matches, and
+    records that do not match are reported. A CSV file with other columns is
+    refused, since new rows would not line up with its header. A final line
+    cut short by an interrupted run is truncated away so new records append
+    cleanly.
+    """
+    try:
+        with open(path, "r", encoding="utf-8", newline="") as handle:
+            text = handle.read()
+    except FileNotFoundError:
+        return set()
+    if text and not text.endswith("\n"):
+        text = text[: text.rfind("\n") + 1]
+        with open(path, "w", encoding="utf-8", newline="") as handle:
+            handle.write(text)
+    done = set()
+    if path.endswith(".csv"):
+        reader = csv.DictReader(io.StringIO(text))
+        if text and tuple(reader.fieldnames or ()) != BATCH_CSV_FIELDS:
+            raise SystemExit(f"BATCH: {path} has different columns than this version writes; use a new --output file")
+        records = list(reader)
+    else:
+        records = []
+        for line in text.splitlines():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    other = 0
+    for record in records:
+        try:
+            seed = int(record["seed"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if all(str(record.get(name)) == str(value) for name, value in config.items()):
+            done.add(seed)
+        else:
+            other += 1
+    if other:
+        settings = " ".join(f"{name}={value}" for name, value in config.items())
+        print(f"BATCH: ignoring {other} records in {path} not made with {settings}")
+    return done
+
+
+def run_batch(
+    seeds: range,
+    width: int,
+    height: int,
+    steps: int,
+    output_path: str,
+    workers: Optional[int] = None,
+    backend: str = "auto",
+    agent_mode: str = "sequential",
+    rng_mode: str = "lcg",
+) -> int:
+    """Run many seeds headlessly and stream one record per seed to output_path.
+
+    Records are JSON lines, or CSV rows when the path ends in .csv, appended
+    in completion order and flushed as each seed finishes. Seeds already
+    recorded with the same size, step count, backend, agent mode and RNG mode
+    are skipped, so an interrupted run resumes where it stopped. At most two tasks per worker are in flight,
+    and workers are replaced every BATCH_TASKS_PER_CHILD seeds to keep their
+    memory bounded.
+    """
+    as_csv = output_path.endswith(".csv")
+    config = {
+        "width": width,
+        "height": height,
+        "steps": steps,
+        "backend": resolve_backend(backend),
+        "agent_mode": agent_mode,
+        "rng_mode": rng_mode,
+    }
+    done = load_batch_results(output_path, config)
+    todo = [seed for seed in seeds if seed not in done]
+    if done:
+        print(f"BATCH: resuming, {len(seeds) - len(todo)} of {len(seeds)} seeds already in {output_path}")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    options = {"backend": backend, "agent_mode": agent_mode, "rng_mode": rng_mode}
+    new_file = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+    with open(output_path, "a", encoding="utf-8", newline="") as handle:
+        writer = csv.DictWriter(handle, fieldnames=BATCH_CSV_FIELDS) if as_csv else None
+        if writer is not None and new_file:
+            writer.writeheader()
+
+        def write(record: Dict[str, object]) -> None:
+            if writer is not None:
+                row = dict(record)
+                row["events"] = ";".join(f"{e['step']}:{e['label']}:{e['detail']}" for e in record["events"])
+                writer.writerow(row)
+            else:
+                handle.write(json.dumps(record) + "\n")
+            handle.flush()
+            hits = len(record["events"])
+            print(f"BATCH: seed {record['seed']} DIGEST={record['digest']} events={hits}")
+
+        executor = None
+        if workers > 0 and len(todo) > 1:
+            try:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+
+                pool_options = {
+                    "max_workers": workers,
+                    "mp_context": multiprocessing.get_context("spawn"),
+                    "initializer": _batch_worker_init,
+                }
+                try:
+                    executor = ProcessPoolExecutor(max_tasks_per_child=BATCH_TASKS_PER_CHILD, **pool_options)
+                except TypeError:
+                    # max_tasks_per_child is new in Python 3.11; older pools keep
+                    # their workers for the whole run.
+                    executor = ProcessPoolExecutor(**pool_options)
+            except (ImportError, OSError, ValueError) as exc:
+                print(f"BATCH: worker pool unavailable ({exc}); running inline")
+        if executor is None:
+            _batch_worker_init()
+            for seed in todo:
+                write(run_batch_seed(seed, width, height, steps, **options))
+            return 0
+        from concurrent.futures import FIRST_COMPLETED, wait
+
+        with executor:
+            pending = set()
+            queue = iter(todo)
+            while True:
+                for seed in queue:
+                    pending.add(executor.submit(run_batch_seed, seed, width, height, steps, **options))
+                    if len(pending) >= 2 * workers:
+                        break
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    write(future.result())
+    return 0
+
+
+def _bench_best(fn, repeats: int) -> float:
+    # Seconds per call: the fastest of `repeats` batches, each batch long enough
+    # (BENCH_MIN_BATCH) that timer resolution and jitter stay small. The batch
+    # size is found by doubling, which also warms up caches.
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        if time.perf_counter() - start >= BENCH_MIN_BATCH:
+            break
+        calls *= 2
+    best = math.inf
+    for _ in range(max(1, repeats)):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        best = min(best, (time.perf_counter() - start) / calls)
+    return best
+
+
+def bench_step_subsystems(sim: Simulation, repeats: int = BENCH_REPEATS, steps: int = BENCH_STEPS) -> Dict[str, float]:
+    # Best-of-repeats seconds per subsystem over `steps` steps of dt 1/60, each
+    # repeat restored from the same snapshot so all of them see identical state.
+    dt = 1.0 / 60.0
+    start_state = sim.snapshot()
+    stages = (
+        ("cells", lambda: sim.update_cells(dt)),
+        ("climate", lambda: sim.update_climate(dt)),
+        ("plants", lambda: sim.update_plants(dt)),
+        ("herbivores", lambda: sim.update_herbivores(dt)),
+        ("predators", lambda: sim.update_predators(dt)),
+    )
+    best = {name: math.inf for name, _ in stages}
+    for _ in range(max(1, repeats)):
+        sim.restore(start_state)
+        totals = dict.fromkeys(best, 0.0)
+        for _ in range(steps):
+            for name, stage in stages:
+                start = time.perf_counter()
+                stage()
+                totals[name] += time.perf_counter() - start
+        for name, seconds in totals.items():
+            best[name] = min(best[name], seconds)
+    sim.restore(start_state)
+    return best
+
+
+def run_bench(
+    sizes=BENCH_SIZES,
+    agent_counts=BENCH_AGENTS,
+    repeats: int = BENCH_REPEATS,
+    backend: str = "auto",
+    seed: int = 0,
+) -> Dict[str, object]:
+    """Time the world builders, step subsystems, relighting, renderers and exporters.
+
+    Every entry in "timings" is the best of `repeats` runs in seconds, keyed
+    "name[WxH]" or, for step subsystems, "step.name[WxH,agents=N]" with N
+    herbivores and N/4 predators. Rendering and video run on offscreen surfaces
+    and are skipped without pygame; the HTML report is skipped without
+    matplotlib.
+    """
+    timings: Dict[str, float] = {}
+    skipped: List[str] = []
+    try:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        # Keep pygame's banner off stdout so `--bench > out.json` stays valid JSON.
+        os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+        import pygame
+    except ModuleNotFoundError:
+        pygame = None
+        skipped.append("render_lit_surface, render_heightmap_3d, AviWriter.add_frame (pygame not installed)")
+    try:
+        import matplotlib  # noqa: F401
+    except ModuleNotFoundError:
+        matplotlib = None
+        skipped.append("write_html_report (matplotlib not installed)")
+    import tempfile
+
+    for size in sizes:
+        width = height = int(size)
+        grid = f"{width}x{height}"
+        heights, temps, rains = build_fields(width, height, seed)
+        base_rainfall = [clamp_unit(rain / 255.0) for rain in rains]
+        timings[f"build_fields[{grid}]"] = _bench_best(lambda: build_fields(width, height, seed), repeats)
+        timings[f"build_flow_fields[{grid}]"] = _bench_best(
+            lambda: build_flow_fields(heights, base_rainfall, width, height), repeats
+        )
+        timings[f"build_normals[{grid}]"] = _bench_best(lambda: build_normals(heights, width, height), repeats)
+        for agents in agent_counts:
+            sim = Simulation(width, height, seed, backend=backend)
+            sim.spawn_herbivores(int(agents))
+            sim.spawn_predators(int(agents) // 4)
+            for name, seconds in bench_step_subsystems(sim, repeats).items():
+                timings[f"step.{name}[{grid},agents={agents}]"] = seconds
+        sim = Simulation(width, height, seed, backend=backend)
+        base_colors, water_mask, normals, basis = build_world_data(sim)
+        sun_dir, sun_height, sky_color = sun_state(0.0, 0.0)
+        timings[f"LightingBasis.relight[{grid}]"] = _bench_best(
+            lambda: basis.relight(sun_dir, sun_height, sky_color), repeats
+        )
+        if pygame is not None:
+            shading = build_shading_arrays(base_colors, normals, water_mask, width, height, sim.heights)
+            surface = pygame.Surface((width, height))
+            timings[f"render_lit_surface[{grid}]"] = _bench_best(
+                lambda: render_lit_surface(
+                    surface, base_colors, normals, water_mask, sun_dir, sun_height, sky_color, width, height, shading
+                ),
+                repeats,
+            )
+            view_size = (viewport_dim(width * DEFAULT_SCALE), viewport_dim(height * DEFAULT_SCALE))
+            view = pygame.Surface(view_size)
+            quality = VIEW3D_QUALITY_PRESETS[1]
+            max_distance = max(width, height) * float(quality["max_dist_scale"])
+            pyramid = terrain_colors = None
+            if shading is not None:
+                pyramid = build_terrain_pyramid(shading, width, height)
+                terrain_colors = preshade_terrain(pyramid, sun_dir, sun_height, sky_color)
+                max_distance *= VIEW3D_LOD_REACH
+            camera_x = max(0.0, (width * DEFAULT_SCALE - view_size[0]) * 0.5)
+            camera_y = max(0.0, (height * DEFAULT_SCALE - view_size[1]) * 0.5)
+            timings[f"render_heightmap_3d[{grid}]"] = _bench_best(
+                lambda: render_heightmap_3d(
+                    pygame,
+                    view,
+                    view.get_rect(),
+                    sim.heights,
+                    base_colors,
+                    normals,
+                    water_mask,
+                    sun_dir,
+                    sun_height,
+                    sky_color,
+                    width,
+                    height,
+                    camera_x,
+                    camera_y,
+                    0.0,
+                    0.0,
+                    0.0,
+                    DEFAULT_SCALE,
+                    view_size[0],
+                    view_size[1],
+                    float(quality["step"]),
+                    max_distance,
+                    shading=shading,
+                    pyramid=pyramid,
+                    terrain_colors=terrain_colors,
+                ),
+                repeats,
+            )
+            with tempfile.TemporaryDirectory() as directory:
+                writer = AviWriter(os.path.join(directory, "bench.avi"), view_size[0], view_size[1])
+                try:
+                    timings[f"AviWriter.add_frame[{grid}]"] = _bench_best(lambda: writer.add_frame(pygame, view), repeats)
+                finally:
+                    writer.close()
+        if matplotlib is not None:
+            sim.spawn_herbivores(max(4, (width * height) // HERBIVORE_DENSITY))
+            sim.spawn_predators(max(2, (width * height) // PREDATOR_DENSITY))
+            plant_history, herb_history, pred_history = [], [], []
+            for _ in range(300):
+                sim.step(1.0 / 60.0)
+                stats = sim.stats()
+                plant_history.append(stats["plant_mean"])
+                herb_history.append(float(stats["herbivores"]))
+                pred_history.append(float(stats["predators"]))
+            report_snapshot = {
+                "seed": seed,
+                "width": width,
+                "height": height,
+                "rainfall_scale": sim.rainfall_scale,
+                "tick": sim.tick,
+                "sim_time": 300 / 60.0,
+                "plant_history": plant_history,
+                "herb_history": herb_history,
+                "pred_history": pred_history,
+                "plant_biomass": list(sim.plant_biomass),
+                "water_mask": list(sim.water_mask),
+                "event_log": [],
+            }
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "bench.html")
+                timings[f"write_html_report[{grid}]"] = _bench_best(
+                    lambda: write_html_report(report_snapshot, path), repeats
+                )
+    return {
+        "backend": resolve_backend(backend),
+        "numpy": np is not None,
+        "repeats": repeats,
+        "steps": BENCH_STEPS,
+        "skipped": skipped,
+        "timings": timings,
+    }
+
+
+def bench_regressions(
+    current: Dict[str, float], baseline: Dict[str, float], threshold: float = BENCH_THRESHOLD
+) -> List[Tuple[str, float, float]]:
+    # Entries slower than baseline by more than `threshold` (a fraction), ignoring
+    # anything under BENCH_MIN_SECONDS where timer noise dominates.
+    regressions = []
+    for key, seconds in current.items():
+        before = baseline.get(key)
+        if before is None or max(seconds, before) < BENCH_MIN_SECONDS:
+            continue
+        if seconds > before * (1.0 + threshold):
+            regressions.append((key, seconds, before))
+    return regressions
+
+
+def selftest_checks(seed: int = 0) -> List[str]:
+    """Regression checks --selftest runs after the digest; returns the failures.
+
+    Backends must agree on the digest in every agent and RNG mode, agent modes
+    must agree while there are no herbivores (batched digests are their own
+    lineage otherwise), a snapshot restored into either backend must continue
+    bit for bit and be refused by a simulation in another mode, and --batch
+    must skip only seeds recorded with the same settings.
+    """
+    import tempfile
+
+    failures: List[str] = []
+    backends = ("python", "numpy") if np is not None else ("python",)
+
+    def run(backend: str, agent_mode: str, rng_mode: str, herbivores: int = 60) -> Simulation:
+        sim = Simulation(SELFTEST_SIZE, SELFTEST_SIZE, seed, backend=backend, agent_mode=agent_mode, rng_mode=rng_mode)
+        sim.spawn_herbivores(herbivores)
+        sim.spawn_predators(herbivores // 4)
+        sim.run_fixed(SELFTEST_STEPS, dt=1.0)
+        return sim
+
+    for agent_mode in AGENT_MODES:
+        for rng_mode in RNG_MODES:
+            if len({run(backend, agent_mode, rng_mode).digest() for backend in backends}) > 1:
+                failures.append(f"{agent_mode}/{rng_mode}: backends disagree")
+    if len({run("python", agent_mode, "lcg", herbivores=0).digest() for agent_mode in AGENT_MODES}) > 1:
+        failures.append("agent modes disagree without herbivores")
+
+    for agent_mode in AGENT_MODES:
+        for rng_mode in RNG_MODES:
+            sim = run(backends[0], agent_mode, rng_mode)
+            state = sim.snapshot()
+            sim.run_fixed(SELFTEST_STEPS, dt=1.0)
+            branch = Simulation(
+                SELFTEST_SIZE, SELFTEST_SIZE, seed, backend=backends[-1], agent_mode=agent_mode, rng_mode=rng_mode
+            )
+            branch.restore(state)
+            branch.run_fixed(SELFTEST_STEPS, dt=1.0)
+            if branch.digest() != sim.digest():
+                failures.append(f"{agent_mode}/{rng_mode}: restored snapshot diverges")
+            other_mode = AGENT_MODES[1 - AGENT_MODES.index(agent_mode)]
+            other = Simulation(SELFTEST_SIZE, SELFTEST_SIZE, seed, agent_mode=other_mode, rng_mode=rng_mode)
+            try:
+                other.restore(state)
+            except ValueError:
+                pass
+            else:
+                failures.append(f"{agent_mode}/{rng_mode}: snapshot accepted in {other_mode} mode")
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "batch.jsonl")
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_batch(range(seed, seed + 2), 16, 16, 5, path, workers=0)
+            run_batch(range(seed, seed + 3), 16, 16, 5, path, workers=0)
+            run_batch(range(seed, seed + 3), 16, 16, 5, path, workers=0, rng_mode="counter")
+        with open(path, "r", encoding="utf-8") as handle:
+            runs = [(record["seed"], record["rng_mode"]) for record in map(json.loads, handle)]
+        expected = [(seed + offset, rng_mode) for rng_mode in RNG_MODES for offset in range(3)]
+        if sorted(runs) != sorted(expected):
+            failures.append(f"batch resume recorded {runs}, expected {expected}")
+    return failures
+
+
 def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Microverse deterministic stub.")
     parser.add_argument("--seed", type=int, default=0, help="Deterministic seed.")
@@ -2218,10 +4949,90 @@ def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     parser.add_argument(
         "--selftest",
         action="store_true",
-        help="Run headless regression and print DIGEST.",
+        help="Run headless regression, print DIGEST, then run the regression checks.",
     )
     parser.add_argument("--width", type=int, default=64, help="Grid width.")
     parser.add_argument("--height", type=int, default=64, help="Grid height.")
+    parser.add_argument(
+        "--backend",
+        choices=SIM_BACKENDS,
+        default="auto",
+        help="Simulation field storage: numpy arrays when available, or pure-Python lists.",
+    )
+    parser.add_argument(
+        "--agent-mode",
+        choices=AGENT_MODES,
+        default="sequential",
+        help="Herbivore update order: per-agent sequential, or batched moves with ranked grazing.",
+    )
+    parser.add_argument(
+        "--rng-mode",
+        choices=RNG_MODES,
+        default="lcg",
+        help="Random streams: sequential LCG, or counter-based draws keyed by step and entity.",
+    )
+    parser.add_argument(
+        "--world-cache",
+        metavar="DIR",
+        default=None,
+        help="Directory for cached terrain/flow fields, reused across launches.",
+    )
+    parser.add_argument(
+        "--sweep",
+        action="store_true",
+        help="Run headless to the first event, then sweep counterfactual parameters and print thresholds.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes for --sweep and --batch (default: all cores; 0 runs inline).",
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="START:STOP",
+        default=None,
+        help="Run seeds START..STOP-1 headlessly for --steps steps each and record results to --output.",
+    )
+    parser.add_argument(
+        "--output",
+        metavar="PATH",
+        default="microverse_batch.jsonl",
+        help="Results file for --batch: JSON lines, or CSV if it ends in .csv; resumed if it exists.",
+    )
+    parser.add_argument(
+        "--bench",
+        action="store_true",
+        help="Time world building, step subsystems, rendering and export, and print JSON.",
+    )
+    parser.add_argument(
+        "--bench-sizes",
+        default=",".join(str(size) for size in BENCH_SIZES),
+        help="Comma-separated square grid sizes for --bench.",
+    )
+    parser.add_argument(
+        "--bench-agents",
+        default=",".join(str(count) for count in BENCH_AGENTS),
+        help="Comma-separated herbivore counts for --bench step timings (predators are a quarter).",
+    )
+    parser.add_argument(
+        "--bench-output",
+        metavar="PATH",
+        default=None,
+        help="Also write the --bench JSON to PATH (usable later as a baseline).",
+    )
+    parser.add_argument(
+        "--bench-baseline",
+        metavar="PATH",
+        default=None,
+        help="Compare --bench timings with a saved JSON file and exit 1 on regressions.",
+    )
+    parser.add_argument(
+        "--bench-threshold",
+        type=float,
+        default=BENCH_THRESHOLD,
+        help="Fractional slowdown over the baseline that counts as a regression.",
+    )
     return parser.parse_args(argv)
 
 
@@ -2229,12 +5040,83 @@ def main(argv: Optional[List[str]] = None) -> int:
     args = parse_args(argv)
     if args.steps < 0:
         raise SystemExit("steps must be >= 0")
-    sim = Simulation(width=args.width, height=args.height, seed=args.seed)
+    WORLD_CACHE.cache_dir = args.world_cache
+    if args.bench:
+        try:
+            sizes = [int(part) for part in args.bench_sizes.split(",") if part]
+            agent_counts = [int(part) for part in args.bench_agents.split(",") if part]
+        except ValueError:
+            raise SystemExit("--bench-sizes and --bench-agents expect comma-separated integers")
+        result = run_bench(sizes, agent_counts, backend=args.backend, seed=args.seed)
+        regressions = []
+        if args.bench_baseline:
+            with open(args.bench_baseline, "r", encoding="utf-8") as handle:
+                baseline = json.load(handle)
+            if baseline.get("backend") != result["backend"]:
+                print(
+                    f"BENCH: baseline backend {baseline.get('backend')!r} differs from {result['backend']!r}",
+                    file=sys.stderr,
+                )
+            regressions = bench_regressions(result["timings"], baseline.get("timings", {}), args.bench_threshold)
+            result["regressions"] = {
+                key: {"seconds": seconds, "baseline": before} for key, seconds, before in regressions
+            }
+        text = json.dumps(result, indent=2, sort_keys=True)
+        print(text)
+        if args.bench_output:
+            with open(args.bench_output, "w", encoding="utf-8") as handle:
+                handle.write(text + "\n")
+        if args.bench_baseline:
+            # Only JSON goes to stdout; the verdict is for whoever watches the run.
+            for key, seconds, before in regressions:
+                print(
+                    f"BENCH: REGRESSION {key} {seconds:.6f}s vs {before:.6f}s (+{(seconds / before - 1.0) * 100.0:.0f}%)",
+                    file=sys.stderr,
+                )
+            if regressions:
+                return 1
+            print(
+                f"BENCH: no regressions beyond {args.bench_threshold * 100.0:.0f}% of {args.bench_baseline}",
+                file=sys.stderr,
+            )
+        return 0
+    if args.batch is not None:
+        try:
+            start, stop = (int(part) for part in args.batch.split(":"))
+        except ValueError:
+            raise SystemExit("--batch expects START:STOP, e.g. 0:1000")
+        return run_batch(
+            range(start, stop),
+            args.width,
+            args.height,
+            args.steps,
+            args.output,
+            workers=args.workers,
+            backend=args.backend,
+            agent_mode=args.agent_mode,
+            rng_mode=args.rng_mode,
+        )
+    sim = Simulation(
+        width=args.width,
+        height=args.height,
+        seed=args.seed,
+        backend=args.backend,
+        agent_mode=args.agent_mode,
+        rng_mode=args.rng_mode,
+    )
     if args.selftest:
         sim.run_fixed(args.steps, dt=1.0)
         digest = sim.digest()
         print(f"DIGEST={digest}")
+        failures = selftest_checks(args.seed)
+        for failure in failures:
+            print(f"SELFTEST: FAILED {failure}")
+        if failures:
+            return 1
+        print("SELFTEST: checks passed")
         return 0
+    if args.sweep:
+        return run_sweep(sim, args.steps, SWEEP_DT, args.workers)
     digest = sim.digest()
     print(f"DIGEST={digest}")
     return run_window(sim)